@@ -8,6 +8,7 @@ from langgraph.prebuilt import ToolNode
 from tools.dummy_tools import dummy_converse
 from utils.state_management import update_context
 from utils.callbacks import CustomCallbackHandler  # Import the custom callback handler
+from utils.model_transport import chat_model_transport, install_model_transport  # Shared pooled model client
 
 load_dotenv()
 app = FastAPI(title="Dummy Agent")
@@ -23,11 +24,13 @@ model = ChatOpenAI(
     model="gpt-4",
     temperature=0,
     openai_api_key=os.getenv("OPENAI_API_KEY", "dummy_key"),
-    max_tokens=100
+    max_tokens=100,
+    **chat_model_transport()
 )
 tools = [dummy_converse]
 model_with_tools = model.bind_tools(tools)
 tool_node = ToolNode(tools=tools)
+install_model_transport(app)  # Warm-up, keep-alive pings and clean shutdown of model connections
 
 # Function to decide flow continuation
 def should_continue(state: MessagesState) -> str:
@@ -1,18 +1,31 @@
 import os  # Standard library for file and environment variable operations
+import json  # Serialize streamed events as newline-delimited JSON
+import asyncio  # Deadlines for model and tool calls
 import traceback  # Used for debugging exceptions
 from fastapi import FastAPI, Request, BackgroundTasks  # Import FastAPI and related classes
+from fastapi.responses import StreamingResponse  # Incremental delivery of agent output
 from dotenv import load_dotenv  # Load environment variables from .env file
 from langchain_openai import ChatOpenAI  # Interface to access OpenAI models
 from langgraph.graph import StateGraph, MessagesState, START, END  # LangGraph components for conversation flow
 from langgraph.prebuilt import ToolNode  # Prebuilt node to execute tool functions
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage  # Message types for conversation
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, AIMessageChunk, ToolMessage  # Message types for conversation
+from langchain_core.runnables import RunnableConfig  # Per-request config (carries the request budget)
 # Import our utility function from the new utils folder
 from utils.utils import handle_tool_calls  
 # Import Ops Agent tools (renamed from ec2_tools.py to ops_agent_tools.py)
 from tools.ops_agent_tools import (list_instances, start_instance, stop_instance, 
     describe_instance, create_instance, list_security_groups, 
-    list_key_pairs, list_volume_types)
-from utils.callbacks import CustomCallbackHandler  # Import the custom callback handler
+    list_key_pairs, list_volume_types, search_instance_types, search_images, fleet_stats,
+    catalog, ec2, prefetch_instances, prefetch_cache, USER_SESSION, USER_DEFAULTS)
+from utils.callbacks import CustomCallbackHandler, recording_callbacks  # Callback handlers (incl. traffic recording)
+from utils.aws_clients import get_client_stats  # AWS call and throttling counters
+from utils.model_transport import chat_model_transport, install_model_transport, get_transport_stats  # Pooled HTTP/2 model client
+from utils.tool_selection import ToolSelector  # Per-turn tool subset selection
+from utils.session_router import session_router, install_session_router, agent_session  # Session affinity across nodes
+from utils.budgets import (RequestBudget, get_budget, partial_answer, run_until_disconnected,
+    stream_until_disconnected)  # Per-request limits
+from utils.traffic import (TRAFFIC_REPLAY_ARCHIVE, ReplayStore, ReplayChatModel, replay_tool,
+    install_traffic_recorder, install_traffic_replay)  # Production traffic record-and-replay
 
 load_dotenv()  # Load all environment variables from .env
 
@@ -30,15 +43,43 @@ model = ChatOpenAI(
     model="gpt-4",  # Specify which GPT model to use
     temperature=0,  # Use temperature 0 for deterministic outputs
     openai_api_key=os.getenv("OPENAI_API_KEY"),  # Get API key from environment
-    max_tokens=4096  # Maximum tokens permitted in responses
+    max_tokens=4096,  # Maximum tokens permitted in responses
+    **chat_model_transport()  # Shared HTTP/2 connection pool instead of a client per model
 )
 tools = [
     list_instances, start_instance, stop_instance, describe_instance,
-    create_instance, list_security_groups, list_key_pairs, list_volume_types
+    create_instance, list_security_groups, list_key_pairs, list_volume_types,
+    search_instance_types, search_images, fleet_stats
 ]  # List of tool functions available to the agent
-model_with_tools = model.bind_tools(tools)  # Bind the tools to the model; this allows the model to invoke them
+if TRAFFIC_REPLAY_ARCHIVE:
+    # Load-test mode: serve recorded model and AWS responses instead of calling the real backends
+    replay_store = ReplayStore(TRAFFIC_REPLAY_ARCHIVE)
+    model = ReplayChatModel(store=replay_store)
+    tools = [replay_tool(t, replay_store) for t in tools]
+    install_traffic_replay(app, replay_store)
+else:
+    install_model_transport(app)  # Warm and keep alive the model connections
+install_traffic_recorder(app)  # Records anonymized traffic when TRAFFIC_RECORD is enabled
+# Keep each session on the node that owns it; its form state and defaults move with it on rebalance
+session_router.register_store("user_session", USER_SESSION)
+session_router.register_store("user_defaults", USER_DEFAULTS)
+install_session_router(app)  # No-op unless CLUSTER_NODES / CLUSTER_SELF are set; installed last so it runs first
+# Tools that change AWS resources; a call that outlives the deadline may still take effect
+MUTATING_TOOLS = {"create_instance", "start_instance", "stop_instance"}
+READ_ONLY_LOOKUPS = ("describe_instance", "list_instances")  # Always bound next to a mutating tool
+# Bind only the tools relevant to each turn; bindings are cached per tool subset (see call_model)
+# (state-changing tools only when the message gives their command, e.g. "stop", "shut down", "launch")
+tool_selector = ToolSelector(tools, companions={name: READ_ONLY_LOOKUPS for name in MUTATING_TOOLS},
+                             commands={"create_instance": {"create"}, "start_instance": {"start"},
+                                       "stop_instance": {"stop"}})
 tool_node = ToolNode(tools=tools)  # Wrap tools into a ToolNode for the LangGraph flow
 
+# Keep the local instance type / AMI catalog fresh without blocking requests
+@app.on_event("startup")
+async def start_catalog_refresh():
+    if not TRAFFIC_REPLAY_ARCHIVE:  # Replays must not touch AWS
+        catalog.start_background_refresh(ec2)
+
 # Function to decide next step in conversation; if a tool call is pending, continue to that node
 def should_continue(state: MessagesState) -> str:
     # Check if the last message has an associated tool call
@@ -46,19 +87,65 @@ def should_continue(state: MessagesState) -> str:
     return "tools" if last_message.tool_calls else END  # If tool call found, continue; otherwise, end the flow
 
 # Function to wrap the model invocation ensuring system prompt is included
-def call_model(state: MessagesState):
+async def call_model(state: MessagesState, config: RunnableConfig):
     # Process the conversation history, handling any special tool calls
     messages = handle_tool_calls(state["messages"])
+    # Stop cleanly with a partial answer once the request's time, tool-call or token budget is used up
+    budget = get_budget(config)
+    reason = budget.exceeded(messages)
+    if reason:
+        return {"messages": [partial_answer(messages, reason)]}
     # Prepend the system prompt if it is not already present in the message history
+    # (identical for every user so the prompt prefix stays cacheable; tools read the session from config)
     if not any(isinstance(msg, SystemMessage) for msg in messages):
         messages.insert(0, SystemMessage(content=system_prompt))
-    response = model_with_tools.invoke(messages)  # Invoke the model with the updated messages list
+    last_human = next((msg for msg in reversed(messages) if isinstance(msg, HumanMessage)), None)
+    user_text = last_human.content if last_human is not None and isinstance(last_human.content, str) else ""
+    # On the first model call, start looking up any instances the user mentioned in parallel,
+    # so the describe/resolve tool call that usually follows is served from the staged result
+    if not TRAFFIC_REPLAY_ARCHIVE and not any(isinstance(msg, AIMessage) for msg in messages):
+        prefetch_instances(user_text)
+    # Send only the schemas of tools relevant to the user's message, plus any already used in this request
+    used_tools = {call["name"] for msg in messages if isinstance(msg, AIMessage) for call in msg.tool_calls or []}
+    if (config or {}).get("configurable", {}).get("session_id") in USER_SESSION:
+        used_tools.add("create_instance")  # Replies to a pending create-instance form carry no command word
+    model_with_tools = tool_selector.bind(model, tool_selector.select(user_text, include=used_tools))
+    try:
+        # Invoke the model with the updated messages list, bounded by the time left in the budget
+        response = await asyncio.wait_for(model_with_tools.ainvoke(messages, config), timeout=budget.remaining())
+    except asyncio.TimeoutError:
+        return {"messages": [partial_answer(messages, budget.exceeded(messages) or "the model took too long")]}
+    budget.record_usage(response)
+    # Refuse tool calls that would overrun the budget instead of starting them
+    if getattr(response, "tool_calls", None):
+        reason = budget.exceeded(messages + [response])
+        if reason:
+            # A streamed draft has already reached the client; repeat it only in whole-response mode
+            streamed = (config or {}).get("configurable", {}).get("streamed")
+            return {"messages": [partial_answer(messages, reason, draft="" if streamed else response.content)]}
     return {"messages": response if isinstance(response, list) else [response]}  # Ensure we always return a list
 
+# Run the requested tools, giving up on waiting for them when the request deadline passes
+async def call_tools(state: MessagesState, config: RunnableConfig):
+    budget = get_budget(config)
+    try:
+        return await asyncio.wait_for(tool_node.ainvoke(state, config), timeout=budget.remaining())
+    except asyncio.TimeoutError:
+        # Sync tools run in worker threads that cannot be interrupted, so the calls are not cancelled;
+        # answer every pending call so the history stays valid, and call_model returns a partial answer
+        return {"messages": [
+            ToolMessage(content=(f"⏱️ The request time limit was reached while {call['name']} was still running. "
+                                 "It may still complete; its result is unknown, so check the instance state "
+                                 "before retrying." if call["name"] in MUTATING_TOOLS else
+                                 "⏱️ The request time limit was reached before this lookup returned."),
+                        tool_call_id=call["id"], name=call["name"])
+            for call in state["messages"][-1].tool_calls
+        ]}
+
 # Define the conversation flow using LangGraph; this modular design makes it easier to extend
 chatflow = StateGraph(MessagesState)
 chatflow.add_node("agent", call_model)  # Add node for the agent's processing
-chatflow.add_node("tools", tool_node)  # Add node for executing tool calls
+chatflow.add_node("tools", call_tools)  # Add node for executing tool calls within the request deadline
 chatflow.add_edge(START, "agent")  # Start flow at the agent node
 chatflow.add_conditional_edges("agent", should_continue, ["tools", END])  # If tool calls needed, go to tools; else end
 chatflow.add_edge("tools", "agent")  # After executing a tool, return to agent for further processing
@@ -70,9 +157,65 @@ async def ops_agent_endpoint(request: Request, background_tasks: BackgroundTasks
     # Parse incoming JSON payload to extract a message from the user
     body = await request.json()
     user_message = body.get("message", "")  # Retrieve user message; default to empty if not provided
-    # Invoke the compiled conversation flow with the user message wrapped in a HumanMessage
-    result = chat_agent.invoke({"messages": [HumanMessage(content=user_message)]})
+    budget = RequestBudget.from_request(body)  # Deadline, tool-call and token limits for this request
+    config = {**budget.config(), "callbacks": recording_callbacks()}  # Attach model/tool outputs to the traffic record, if any
+    config["configurable"]["session_id"] = agent_session(body)  # Same ID the session router routes on
+    # Invoke the compiled conversation flow with the user message wrapped in a HumanMessage;
+    # the run is cancelled if the client disconnects before it finishes
+    result = await run_until_disconnected(request, chat_agent.ainvoke(
+        {"messages": [HumanMessage(content=user_message)]}, config=config,
+    ))
+    if result is None:
+        return {"response": "", "cancelled": True}  # Nobody is listening any more
     final_messages = result["messages"]  # Extract responses from the model
     # Concatenate all AI responses into a single text output
     response_text = "\n".join([msg.content for msg in final_messages if isinstance(msg, AIMessage)])
     return {"response": response_text}  # Return the result as JSON
+
+# Stream the agent's output as newline-delimited JSON events while it is being generated:
+#   {"type": "text", "text": ...}       a piece of the answer
+#   {"type": "tool_start", "tools": [...]}  the agent is running tools
+#   {"type": "done"}                     the answer is complete
+@app.post("/ops_agent/stream")
+async def ops_agent_stream_endpoint(request: Request):
+    body = await request.json()
+    user_message = body.get("message", "")
+    budget = RequestBudget.from_request(body)
+    config = {**budget.config(), "callbacks": recording_callbacks()}
+    config["configurable"]["session_id"] = agent_session(body)
+    config["configurable"]["streamed"] = True  # Model text is sent as it is generated
+
+    # Cancelled when the client disconnects, which cancels the graph run (see stream_until_disconnected)
+    async def events():
+        last_message_id = None  # Separate consecutive AI messages the same way /ops_agent joins them
+        async for mode, chunk in chat_agent.astream(
+            {"messages": [HumanMessage(content=user_message)]},
+            config=config,
+            stream_mode=["messages", "updates"],
+        ):
+            if mode == "messages":
+                message, metadata = chunk
+                if metadata.get("langgraph_node") != "agent" or not isinstance(message, (AIMessage, AIMessageChunk)):
+                    continue
+                if not isinstance(message.content, str) or not message.content:
+                    continue
+                if last_message_id is not None and message.id != last_message_id:
+                    yield json.dumps({"type": "text", "text": "\n"}) + "\n"
+                last_message_id = message.id
+                yield json.dumps({"type": "text", "text": message.content}) + "\n"
+            elif mode == "updates" and chunk.get("agent"):
+                # Partial answers returned when a budget is hit already arrive through the "messages" stream
+                agent_messages = chunk["agent"]["messages"]
+                tool_calls = [call["name"] for msg in agent_messages for call in getattr(msg, "tool_calls", [])]
+                if tool_calls:
+                    yield json.dumps({"type": "tool_start", "tools": tool_calls}) + "\n"
+        yield json.dumps({"type": "done"}) + "\n"
+
+    return StreamingResponse(stream_until_disconnected(request, events()), media_type="application/x-ndjson")
+
+# Expose runtime counters (AWS calls, retries and throttling) for dashboards and debugging
+@app.get("/metrics")
+async def metrics_endpoint():
+    return {"aws": get_client_stats(), "catalog": catalog.stats(), "prefetch": prefetch_cache.stats(),
+            "tool_selection": tool_selector.stats(), "model_transport": get_transport_stats(),
+            "session_router": session_router.stats()}
@@ -1,13 +1,202 @@
-from fastapi import APIRouter, Request
+import asyncio
+import os
+import threading
+import time
+from urllib.parse import urlparse
+import jwt
+import requests
+from requests.adapters import HTTPAdapter
+from fastapi import APIRouter, Request, BackgroundTasks
+from fastapi.responses import JSONResponse
+from dotenv import load_dotenv
+
+load_dotenv()
 
 router = APIRouter()
+TEAMS_APP_ID = os.getenv("TEAMS_APP_ID")
+TEAMS_APP_PASSWORD = os.getenv("TEAMS_APP_PASSWORD")
+TEAMS_TOKEN_URL = os.getenv("TEAMS_TOKEN_URL", "https://login.microsoftonline.com/botframework.com/oauth2/v2.0/token")
+TEAMS_TOKEN_SCOPE = "https://api.botframework.com/.default"
+# Point outgoing connector calls at a local stand-in instead of the serviceUrl Teams sends
+TEAMS_SERVICE_URL_OVERRIDE = os.getenv("TEAMS_SERVICE_URL_OVERRIDE")
+# Hosts (and their subdomains) allowed to receive replies carrying the bot's access token
+TEAMS_SERVICE_URL_HOSTS = [host.strip().lower() for host in os.getenv(
+    "TEAMS_SERVICE_URL_HOSTS", "botframework.com,trafficmanager.net,teams.microsoft.com,botframework.azure.us"
+).split(",") if host.strip()]
+# Signing keys and issuer of the tokens the Bot Framework sends with every activity
+TEAMS_JWKS_URL = os.getenv("TEAMS_JWKS_URL", "https://login.botframework.com/v1/.well-known/keys")
+TEAMS_TOKEN_ISSUER = "https://api.botframework.com"
+TEAMS_AGENT_URL = os.getenv("TEAMS_AGENT_URL", "http://localhost:8000/ops_agent")
+AGENT_TIMEOUT = float(os.getenv("TEAMS_AGENT_TIMEOUT", "300"))
+TYPING_INTERVAL = 3  # Teams hides the typing indicator after a few seconds, so it is re-sent
+
+# Conversation references (service URL, conversation, bot and user) keyed by conversation ID,
+# used to post proactive replies after the webhook request has already been answered
+CONVERSATION_REFERENCES = {}
+
+
+class ConnectorClient:
+    """
+    Pooled HTTP client for the Bot Framework connector API with a cached access token.
+
+    Without TEAMS_APP_PASSWORD no token is requested, which lets the integration run
+    against the Bot Framework Emulator or a local stand-in connector.
+    """
+
+    def __init__(self, app_id: str = None, app_password: str = None, pool_size: int = 20):
+        self.app_id = app_id
+        self.app_password = app_password
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._token = None
+        self._token_expires_at = 0
+        self._lock = threading.Lock()
+
+    def _auth_headers(self) -> dict:
+        if not self.app_password:
+            return {}
+        with self._lock:
+            # Renew five minutes before expiry so in-flight sends never carry a stale token
+            if not self._token or time.time() > self._token_expires_at - 300:
+                response = self.session.post(TEAMS_TOKEN_URL, data={
+                    "grant_type": "client_credentials",
+                    "client_id": self.app_id,
+                    "client_secret": self.app_password,
+                    "scope": TEAMS_TOKEN_SCOPE,
+                }, timeout=10)
+                response.raise_for_status()
+                token = response.json()
+                self._token = token["access_token"]
+                self._token_expires_at = time.time() + int(token.get("expires_in", 3600))
+            return {"Authorization": f"Bearer {self._token}"}
+
+    def send_activity(self, reference: dict, activity: dict) -> dict:
+        """
+        Posts an activity (message, typing, ...) into the referenced conversation.
+        """
+        service_url = (TEAMS_SERVICE_URL_OVERRIDE or reference["service_url"]).rstrip("/")
+        if self.app_password and not TEAMS_SERVICE_URL_OVERRIDE and not allowed_service_url(service_url):
+            raise ValueError(f"Refusing to send to {service_url}: host not in TEAMS_SERVICE_URL_HOSTS")
+        conversation_id = reference["conversation"]["id"]
+        payload = {
+            "from": reference["bot"],
+            "recipient": reference["user"],
+            "conversation": reference["conversation"],
+            **activity,
+        }
+        response = self.session.post(
+            f"{service_url}/v3/conversations/{conversation_id}/activities",
+            headers=self._auth_headers(),
+            json=payload,
+            timeout=10,
+        )
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+
+connector = ConnectorClient(TEAMS_APP_ID, TEAMS_APP_PASSWORD)
+signing_keys = jwt.PyJWKClient(TEAMS_JWKS_URL)  # Caches the Bot Framework keys between requests
+
+
+def allowed_service_url(service_url: str) -> bool:
+    """
+    True if `service_url` is an https URL on one of TEAMS_SERVICE_URL_HOSTS.
+    """
+    parsed = urlparse(service_url or "")
+    host = (parsed.hostname or "").lower()
+    return parsed.scheme == "https" and any(host == allowed or host.endswith("." + allowed)
+                                           for allowed in TEAMS_SERVICE_URL_HOSTS)
+
+
+def authenticate_activity(authorization: str, activity: dict) -> bool:
+    """
+    Validates the Bot Framework JWT sent with an activity: signature, issuer, audience (our
+    app ID), expiry, and that it was issued for the activity's serviceUrl.
+    """
+    if not TEAMS_APP_ID or not authorization or not authorization.startswith("Bearer "):
+        return False
+    token = authorization.removeprefix("Bearer ").strip()
+    try:
+        key = signing_keys.get_signing_key_from_jwt(token).key
+        claims = jwt.decode(token, key, algorithms=["RS256"], audience=TEAMS_APP_ID,
+                            issuer=TEAMS_TOKEN_ISSUER, leeway=300)
+    except jwt.PyJWTError as e:
+        print(f"Rejected Teams activity: {e}")
+        return False
+    return claims.get("serviceUrl", "").rstrip("/") == activity.get("serviceUrl", "").rstrip("/")
+
+
+def conversation_reference(activity: dict) -> dict:
+    """
+    Extracts what is needed to message a conversation later from an incoming activity.
+    """
+    return {
+        "service_url": activity.get("serviceUrl", ""),
+        "channel_id": activity.get("channelId"),
+        "conversation": activity.get("conversation", {}),
+        "bot": activity.get("recipient", {}),
+        "user": activity.get("from", {}),
+    }
+
 
 @router.get("/teams_webhook")
 async def teams_webhook_get():
     return {"status": "Teams webhook active"}
 
+
 @router.post("/teams_webhook")
-async def teams_webhook_post(request: Request):
-    body = await request.json()
-    # Dummy processing: echo received data
-    return {"status": "Received message", "data": body}
+async def teams_webhook_post(request: Request, background_tasks: BackgroundTasks):
+    activity = await request.json()
+    authenticated = await asyncio.to_thread(authenticate_activity, request.headers.get("Authorization"), activity)
+    if TEAMS_APP_PASSWORD and not authenticated:  # With credentials configured, activities must be signed
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    conversation_id = activity.get("conversation", {}).get("id")
+    if not conversation_id:
+        return {"status": "ignored"}
+    reference = conversation_reference(activity)
+    existing = CONVERSATION_REFERENCES.get(conversation_id)
+    if existing and not authenticated:
+        reference["service_url"] = existing["service_url"]  # Only a signed activity may redirect replies
+    CONVERSATION_REFERENCES[conversation_id] = reference
+    text = (activity.get("text") or "").strip()
+    if activity.get("type") == "message" and text:
+        # Acknowledge right away; the agent runs after the response is sent
+        background_tasks.add_task(process_activity, conversation_id, activity.get("id"), text)
+    return {"status": "accepted"}
+
+
+def keep_typing(reference: dict, done: threading.Event):
+    """
+    Re-sends the typing indicator until `done` is set.
+    """
+    while not done.is_set():
+        try:
+            connector.send_activity(reference, {"type": "typing"})
+        except Exception as e:
+            print(f"Teams typing indicator failed: {e}")
+            return
+        done.wait(TYPING_INTERVAL)
+
+
+def process_activity(conversation_id: str, activity_id: str, text: str):
+    reference = CONVERSATION_REFERENCES[conversation_id]
+    done = threading.Event()
+    threading.Thread(target=keep_typing, args=(reference, done), daemon=True).start()
+    try:
+        response = connector.session.post(
+            TEAMS_AGENT_URL,
+            json={"message": text, "session_id": conversation_id},
+            timeout=AGENT_TIMEOUT,
+        )
+        response.raise_for_status()
+        answer = response.json().get("response") or "(no response)"
+    except Exception as e:
+        answer = f"❌ Error: {str(e)}"
+    finally:
+        done.set()
+    try:
+        connector.send_activity(reference, {"type": "message", "text": answer, "replyToId": activity_id})
+    except Exception as e:
+        print(f"Teams proactive reply failed: {e}")
@@ -1,4 +1,7 @@
 import os
+import re
+import json
+import time
 import requests
 from fastapi import APIRouter, Request, Query, BackgroundTasks
 from dotenv import load_dotenv
@@ -9,6 +12,18 @@ router = APIRouter()
 WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN")
 WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
 META_API_URL = f"https://graph.facebook.com/v16.0/{WHATSAPP_PHONE_NUMBER_ID}/messages"
+WHATSAPP_AGENT_STREAM_URL = os.getenv("WHATSAPP_AGENT_STREAM_URL", "http://localhost:8000/ops_agent/stream")
+AGENT_TIMEOUT = float(os.getenv("WHATSAPP_AGENT_TIMEOUT", "300"))
+
+MAX_MESSAGE_CHARS = 1500  # Stay well under WhatsApp's text body limit
+PARAGRAPH_FLUSH_CHARS = 200  # Send complete paragraphs once at least this much text is waiting
+SENTENCE_FLUSH_CHARS = 600  # Without a paragraph break, send complete sentences past this size
+INTERIM_INTERVAL = 15  # Minimum seconds between "working on it…" updates
+SENTENCE_END = re.compile(r"[.!?…:](?=\s)")
+FENCE = re.compile(r"```[^\n`]*")  # A code fence with its optional language tag
+
+# Pooled HTTP connections shared by all background sends
+http = requests.Session()
 
 @router.get("/webhook")
 async def verify_webhook(
@@ -33,27 +48,118 @@ async def whatsapp_webhook(request: Request, background_tasks: BackgroundTasks):
         background_tasks.add_task(process_message, sender_number, message_text)
     return {"status": "success"}
 
-def process_message(sender_number, message_text):
+def send_text(sender_number, text):
     headers = {
         "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
         "Content-Type": "application/json"
     }
+    payload = {
+        "messaging_product": "whatsapp",
+        "to": sender_number,
+        "text": {"body": text}
+    }
+    http.post(META_API_URL, headers=headers, json=payload, timeout=10)
+
+def find_cut(text, final=False):
+    """
+    Returns how many leading characters of `text` form a complete chunk ready to send, or None.
+
+    Chunks end at a paragraph break when possible, then at a sentence end, then at a line break or space,
+    and never inside an open ``` code block unless the chunk would exceed MAX_MESSAGE_CHARS.
+    """
+    window = text[:MAX_MESSAGE_CHARS]
+    oversized = len(text) > MAX_MESSAGE_CHARS
+
+    def closed_fences(end):
+        return window[:end].count("```") % 2 == 0
+
+    paragraph = window.rfind("\n\n")
+    while paragraph > 0 and not closed_fences(paragraph):
+        paragraph = window.rfind("\n\n", 0, paragraph)
+    if paragraph > 0 and (paragraph >= PARAGRAPH_FLUSH_CHARS or oversized):
+        return paragraph + 2
+    if len(text) >= SENTENCE_FLUSH_CHARS or oversized:
+        sentence_ends = [m.end() for m in SENTENCE_END.finditer(window) if closed_fences(m.end())]
+        if sentence_ends:
+            return sentence_ends[-1]
+    if oversized:
+        newline = window.rfind("\n")
+        if newline > MAX_MESSAGE_CHARS // 2:
+            return newline + 1  # Keep lines (and code) whole
+        space = window.rfind(" ")
+        return space + 1 if space > 0 else MAX_MESSAGE_CHARS
+    if final:
+        return len(text)
+    return None
+
+def open_fence(text):
+    """Returns the opening line (e.g. "```python") of a code block left open at the end of `text`, or None."""
+    fences = FENCE.findall(text)
+    return fences[-1] if len(fences) % 2 else None
+
+class IncrementalSender:
+    """
+    Buffers streamed agent text and sends it as WhatsApp messages at natural boundaries
+    as soon as each chunk is complete.
+    """
+
+    def __init__(self, sender_number):
+        self.sender_number = sender_number
+        self.buffer = ""
+        self.last_sent_at = None  # Monotonic time of the last message sent
+
+    def send(self, text):
+        text = text.strip()
+        if text:
+            send_text(self.sender_number, text)
+            self.last_sent_at = time.monotonic()
+
+    def feed(self, text):
+        self.buffer += text
+        self.flush()
+
+    def flush(self, final=False):
+        while self.buffer:
+            cut = find_cut(self.buffer, final)
+            if cut is None:
+                return
+            chunk, self.buffer = self.buffer[:cut], self.buffer[cut:]
+            fence = open_fence(chunk)
+            if fence and self.buffer.strip():
+                # An oversized chunk was cut inside a code block: close it here and reopen it in the next
+                # message, so the rest of the block is not mistaken for text outside a fence
+                chunk = chunk.rstrip("\n") + "\n```"
+                self.buffer = fence + "\n" + self.buffer.lstrip("\n")
+            self.send(chunk)
+
+    def working(self, tools):
+        # Tell the user something is happening while tools run, at most every INTERIM_INTERVAL seconds
+        sent_before = self.last_sent_at
+        self.flush(final=True)  # Whatever the model said before calling tools is complete
+        if self.last_sent_at != sent_before:
+            return  # The model's own words already told the user what is happening
+        if sent_before is None or time.monotonic() - sent_before >= INTERIM_INTERVAL:
+            self.send(f"⏳ Working on it… ({', '.join(tools)})" if tools else "⏳ Working on it…")
+
+def process_message(sender_number, message_text):
+    sender = IncrementalSender(sender_number)
     try:
-        # Here you would integrate with your agent – for example, call the EC2 agent HTTP endpoint
-        response_text = f"Processed message: {message_text}"  # placeholder logic
-        chunk_size = 1500
-        chunks = [response_text[i : i + chunk_size] for i in range(0, len(response_text), chunk_size)]
-        for chunk in chunks:
-            payload = {
-                "messaging_product": "whatsapp",
-                "to": sender_number,
-                "text": {"body": chunk.strip()}
-            }
-            requests.post(META_API_URL, headers=headers, json=payload)
+        with http.post(
+            WHATSAPP_AGENT_STREAM_URL,
+            json={"message": message_text, "session_id": sender_number},
+            stream=True,
+            timeout=AGENT_TIMEOUT,
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["type"] == "text":
+                    sender.feed(event["text"])
+                elif event["type"] == "tool_start":
+                    sender.working(event.get("tools", []))
+        sender.flush(final=True)
     except Exception as e:
-        error_payload = {
-            "messaging_product": "whatsapp",
-            "to": sender_number,
-            "text": {"body": f"❌ Error: {str(e)}"}
-        }
-        requests.post(META_API_URL, headers=headers, json=error_payload)
+        sender.flush(final=True)
+        send_text(sender_number, f"❌ Error: {str(e)}")
@@ -1,9 +1,9 @@
 from langchain_core.tools import tool
-import boto3
+from utils.aws_clients import DEFAULT_REGION, get_client
 
-# Initialize AWS EC2 Client
-AWS_REGION = "ap-south-1"
-ec2 = boto3.client("ec2", region_name=AWS_REGION)
+# Shared AWS EC2 Client
+AWS_REGION = DEFAULT_REGION
+ec2 = get_client("ec2", AWS_REGION)
 
 # Store user responses across interactions
 USER_SESSION = {}
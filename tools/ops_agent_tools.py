@@ -1,12 +1,107 @@
+import re  # Pattern matching for instance parameters in free-text requests
+import threading  # Guard the cached fleet table
+import time  # Fleet table expiry
+from concurrent.futures import Future  # Placeholders for in-flight speculative lookups
+from langchain_core.runnables import RunnableConfig  # Carries the request's session ID into tools
 from langchain_core.tools import tool  # Import decorator to expose functions as tools
-import boto3  # AWS SDK for Python to interact with EC2
+from utils.aws_clients import DEFAULT_REGION, get_client  # Shared, tuned AWS clients
+from utils.catalog import CatalogIndex  # Local snapshot of instance types and AMIs
+from utils.fleet_table import FleetTable  # Columnar inventory for local aggregate queries
+from utils.prefetch import MISS, SpeculativeCache, extract_identifiers  # Speculative inventory lookups
 
-# Initialize AWS EC2 Client using a fixed AWS region (adjust region as needed)
-AWS_REGION = "ap-south-1"
-ec2 = boto3.client("ec2", region_name=AWS_REGION)
+# Shared EC2 client for the default region (set AWS_REGION to change it)
+AWS_REGION = DEFAULT_REGION
+ec2 = get_client("ec2", AWS_REGION)
+
+# Local instance type / AMI index; refreshed in the background by the agent app
+catalog = CatalogIndex()
+
+# Instance lookups started speculatively from the user's message (see prefetch_instances)
+prefetch_cache = SpeculativeCache()
+
+# Columnar inventory snapshot answering fleet_stats queries; rebuilt when older than the TTL
+FLEET_TABLE_TTL_SECONDS = 60
+FLEET_TABLE = {"table": None, "built_at": 0.0}
+fleet_table_lock = threading.Lock()
 
 # Dictionary to store user session data across interactions
 USER_SESSION = {}
+# Last successful instance specification per user, offered as defaults for the next launch
+USER_DEFAULTS = {}
+DEFAULT_SESSION = "default"  # Session key for callers that do not send a session ID
+
+# EBS volume types and their common use cases
+VOLUME_TYPES = {
+    "gp3": "General Purpose SSD (default)",
+    "gp2": "Older General Purpose SSD",
+    "io1": "Provisioned IOPS SSD (high performance)",
+    "io2": "Provisioned IOPS SSD (high durability)",
+    "st1": "Throughput Optimized HDD (for big data workloads)",
+    "sc1": "Cold HDD (for infrequent access)",
+    "standard": "Magnetic (legacy type)"
+}
+MAX_VOLUME_SIZE_GB = 16384  # EBS upper limit for gp2/gp3 volumes
+
+# OS names recognised in free text even before the catalog index has been built
+OS_NAMES = ("ubuntu", "amazon linux")
+
+# Fields required to launch an instance, in form order, with their display labels
+INSTANCE_FIELDS = {
+    "instance_type": "Instance type",
+    "ami": "OS image / AMI",
+    "key_name": "Key pair",
+    "security_group": "Security group",
+    "volume_type": "Volume type",
+    "volume_size": "Volume size (GB)",
+    "project": "Project tag",
+    "owner": "Owner tag",
+    "name": "Name tag",
+}
+FIELD_HINTS = {
+    "instance_type": "e.g., t3.micro, t3.medium, m5.large, see search_instance_types",
+    "ami": "AMI ID or OS name, e.g., Ubuntu, Amazon Linux, see search_images",
+    "key_name": "see list_key_pairs",
+    "security_group": "name or sg- ID, see list_security_groups",
+    "volume_type": "see list_volume_types",
+    "volume_size": "e.g., 20GB, 50GB",
+    "project": "project name",
+    "owner": "owner of the instance",
+    "name": "instance name",
+}
+# Label spellings users type in front of a value ("Owner: Asha", "key_name=ops-key")
+FIELD_LABELS = {
+    "instance type": "instance_type", "type": "instance_type",
+    "ami": "ami", "image": "ami", "os": "ami",
+    "key": "key_name", "key name": "key_name", "key pair": "key_name", "keypair": "key_name",
+    "security group": "security_group", "sg": "security_group",
+    "volume type": "volume_type", "storage type": "volume_type",
+    "volume size": "volume_size", "storage size": "volume_size", "size": "volume_size",
+    "project": "project", "owner": "owner", "name": "name",
+}
+
+INSTANCE_TYPE_PATTERN = re.compile(
+    r"\b[a-z][a-z0-9-]*\d[a-z0-9-]*\.(?:nano|micro|small|medium|large|metal(?:-\d+xl)?|\d*xlarge)\b", re.I)
+AMI_ID_PATTERN = re.compile(r"\bami-[0-9a-f]{8,17}\b")
+SECURITY_GROUP_ID_PATTERN = re.compile(r"\bsg-[0-9a-f]{8,17}\b")
+# Sizes only count as disk sizes next to a storage word ("50GB disk", "storage 100 GB", "50GB gp3"),
+# so "16GB memory" is not mistaken for the volume size
+VOLUME_SIZE_PATTERN = re.compile(
+    r"\b(?:disk|storage|volume|ebs|root|ssd|hdd|gp[23]|io[12]|st1|sc1)(?:\s+(?:size|of))?\s*(?:[:=]\s*)?(?P<before>\d{1,5})\s*(?:gb|gib)\b"
+    r"|\b(?P<after>\d{1,5})\s*(?:gb|gib)\s+(?:of\s+)?(?:disk|storage|volume|ebs|root|ssd|hdd|gp[23]|io[12]|st1|sc1)\b",
+    re.I)
+FIELD_LABEL_ALTERNATION = "|".join(sorted((re.escape(label).replace(r"\ ", r"[\s_-]+") for label in FIELD_LABELS),
+                                          key=len, reverse=True))
+# A labelled value runs to the next comma, semicolon, line break or label ("Owner: Asha Kumar Name: api-1")
+LABELLED_FIELD_PATTERN = re.compile(
+    r"(?<![\w-])(?P<label>" + FIELD_LABEL_ALTERNATION + r")\s*[:=]\s*"
+    r"(?P<value>\"[^\"]+\"|'[^']+'|[^,;\n]+?)"
+    r"(?=\s*(?:[,;\n]|$|(?<![\w-])(?:" + FIELD_LABEL_ALTERNATION + r")\s*[:=]))", re.I)
+# Name-like tokens that are really sizes, volume types, resource IDs or times ("50GB", "gp3", "5pm")
+NOT_AN_INSTANCE_NAME_PATTERN = re.compile(
+    r"\d+(?:\.\d+)?(?:gb|gib|tb|tib|mb|mib)|" + "|".join(VOLUME_TYPES)
+    + r"|(?:ami|sg|vol|subnet|vpc)-[0-9a-f]+|\d{1,2}(?:am|pm)", re.I)
+USE_DEFAULTS_PATTERN = re.compile(r"\b(use|accept|keep) (the )?defaults?\b", re.I)
+FLEET_FILTER_PATTERN = re.compile(r"^\s*([\w: .-]+?)\s*(!=|=|>|<)\s*(.+?)\s*$")
 
 @tool
 def list_security_groups() -> str:
@@ -45,93 +140,95 @@ def list_volume_types() -> str:
     Returns:
       A formatted string with volume type names and descriptions.
     """
-    volume_types = {
-        "gp3": "General Purpose SSD (default)",
-        "gp2": "Older General Purpose SSD",
-        "io1": "Provisioned IOPS SSD (high performance)",
-        "io2": "Provisioned IOPS SSD (high durability)",
-        "st1": "Throughput Optimized HDD (for big data workloads)",
-        "sc1": "Cold HDD (for infrequent access)",
-        "standard": "Magnetic (legacy type)"
-    }
-    response = "\n".join([f"- **{vt}**: {desc}" for vt, desc in volume_types.items()])
+    response = "\n".join([f"- **{vt}**: {desc}" for vt, desc in VOLUME_TYPES.items()])
     return f"**Available Volume Types:**\n{response}"
 
 @tool
-def create_instance(user_id: str, request: str) -> str:
+def create_instance(request: str = "", instance_type: str = "", ami: str = "",
+                    key_name: str = "", security_group: str = "", volume_type: str = "",
+                    volume_size: int = 0, project: str = "", owner: str = "", name: str = "",
+                    config: RunnableConfig = None) -> str:
     """
-    Creates a new EC2 instance. If required details are missing, prompts the user for more information.
-    
+    Creates a new EC2 instance from a complete specification in a single call.
+
+    Pass every detail the user has given, either as explicit arguments or inside `request`
+    (e.g. "t3.medium Ubuntu 50GB gp3 key: ops-key sg: default Project: Billing Owner: Asha Name: api-1").
+    If anything is missing or invalid, ALL missing fields are returned at once as a form, with
+    defaults pre-filled from the user's previous launch. Replying "use defaults" accepts them.
+
     Parameters:
-      user_id (str): Identifier for the user session.
       request (str): Natural language request and parameters from the user.
-      
+      instance_type, ami, key_name, security_group, volume_type, volume_size, project, owner, name:
+        Optional explicit values; they override anything parsed from `request`.
+      config (RunnableConfig): Injected by the agent, never by the model; its
+        `configurable.session_id` keys the form and defaults to the requesting user.
+
     Returns:
       A confirmation message if instance creation is successful,
-      or a prompt asking for additional details if parameters are missing.
+      or a single form listing every missing or invalid detail.
     """
-    required_params = ["instance_type", "ami", "key_name", "security_group", "volume_type", "volume_size", "project", "owner", "name"]
-    
-    if user_id not in USER_SESSION:
-        USER_SESSION[user_id] = {}  # Initialize session store for the user
-    
-    # Attempt to extract parameters from the user request using basic string matching
-    if "t2.micro" in request or "t3.medium" in request:
-        USER_SESSION[user_id]["instance_type"] = "t2.micro" if "t2.micro" in request else "t3.medium"
-    if "Ubuntu" in request:
-        USER_SESSION[user_id]["ami"] = "ami-12345678"  # Example AMI for Ubuntu
-    if "Amazon Linux" in request:
-        USER_SESSION[user_id]["ami"] = "ami-87654321"  # Example AMI for Amazon Linux
-    if "use my key" in request:
-        USER_SESSION[user_id]["key_name"] = "my-key-pair"  # Default key pair name
-    if "default security group" in request:
-        USER_SESSION[user_id]["security_group"] = "default"
-    if "gp3" in request or "io1" in request:
-        USER_SESSION[user_id]["volume_type"] = "gp3" if "gp3" in request else "io1"
-    if "20GB" in request or "50GB" in request:
-        USER_SESSION[user_id]["volume_size"] = "20" if "20GB" in request else "50"
-    
-    # Extract mandatory tags by simple string splitting
-    if "Project:" in request:
-        USER_SESSION[user_id]["project"] = request.split("Project:")[-1].strip().split()[0]
-    if "Owner:" in request:
-        USER_SESSION[user_id]["owner"] = request.split("Owner:")[-1].strip().split()[0]
-    if "Name:" in request:
-        USER_SESSION[user_id]["name"] = request.split("Name:")[-1].strip().split()[0]
-    
-    # Check for any missing required parameters
-    missing_params = [param for param in required_params if param not in USER_SESSION[user_id]]
-    if missing_params:
-        next_param = missing_params[0]
-        follow_up_questions = {
-            "instance_type": "What instance type would you like? (e.g., t2.micro, t3.medium)",
-            "ami": "Which OS image do you want? (e.g., Ubuntu 22.04, Amazon Linux 2)?",
-            "key_name": "Do you have a key pair? If not, do you want me to create one?",
-            "security_group": "Which security group should I attach? (Use `/list_security_groups` to see options.)",
-            "volume_type": "What storage type do you need? (Use `/list_volume_types` to see options.)",
-            "volume_size": "What size should the storage be? (e.g., 20GB, 50GB)?",
-            "project": "What is the project name for this instance?",
-            "owner": "Who is the owner of this instance?",
-            "name": "What should be the instance name?"
-        }
-        # Return the prompt for the next missing parameter
-        return follow_up_questions[next_param]
-    
+    user_id = (config or {}).get("configurable", {}).get("session_id") or DEFAULT_SESSION
+    spec = USER_SESSION.setdefault(user_id, {})  # Partially filled form carried across turns
+    explicit = {
+        "instance_type": instance_type, "ami": ami, "key_name": key_name,
+        "security_group": security_group, "volume_type": volume_type,
+        "volume_size": volume_size or "", "project": project, "owner": owner, "name": name,
+    }
+    candidates = parse_instance_request(request)
+    candidates.update({field: value for field, value in explicit.items() if value})  # Explicit values win
+
+    # Validate everything in one pass; keep valid values and collect errors for the rest.
+    # The instance type goes first because an OS name resolves to an AMI for its architecture.
+    errors = {}
+    for field, value in sorted(candidates.items(), key=lambda item: item[0] != "instance_type"):
+        normalized, error = validate_instance_field(field, value, spec)
+        if error:
+            errors[field] = error
+            continue
+        spec[field] = normalized
+        if field == "ami":
+            if AMI_ID_PATTERN.fullmatch(str(value).strip()):
+                spec.pop("os", None)  # An explicit AMI ID is used as given
+            else:
+                spec["os"] = str(value).strip()  # Kept so the AMI can follow a later instance type change
+
+    defaults = USER_DEFAULTS.get(user_id, {})
+    if USE_DEFAULTS_PATTERN.search(request or ""):
+        default_image = "ami" not in spec
+        for field, value in defaults.items():
+            if field == "os" and not default_image:
+                continue  # The remembered OS only applies together with the remembered AMI
+            spec.setdefault(field, value)
+
+    # Re-resolve an OS name against the current instance type (it may have changed on this turn)
+    if spec.get("os") and "ami" not in candidates and "ami" not in errors:
+        normalized, error = validate_instance_field("ami", spec["os"], spec)
+        if error:
+            spec.pop("ami", None)
+            errors["ami"] = error
+        else:
+            spec["ami"] = normalized
+
+    missing_params = [param for param in INSTANCE_FIELDS if param not in spec]
+    if missing_params or errors:
+        return format_instance_form(spec, missing_params, errors, defaults)
+
     # All required parameters present; attempt to provision a new instance using boto3
+    groups = ({"SecurityGroupIds": [spec["security_group"]]} if spec["security_group"].startswith("sg-")
+              else {"SecurityGroups": [spec["security_group"]]})
     try:
         response = ec2.run_instances(
-            ImageId=USER_SESSION[user_id]["ami"],
-            InstanceType=USER_SESSION[user_id]["instance_type"],
-            KeyName=USER_SESSION[user_id]["key_name"],
-            SecurityGroups=[USER_SESSION[user_id]["security_group"]],
+            ImageId=spec["ami"],
+            InstanceType=spec["instance_type"],
+            KeyName=spec["key_name"],
             MinCount=1,
             MaxCount=1,
             BlockDeviceMappings=[
                 {
-                    "DeviceName": "/dev/xvda",
+                    "DeviceName": root_device_name(spec["ami"]),  # Resize the root volume, not add one
                     "Ebs": {
-                        "VolumeSize": int(USER_SESSION[user_id]["volume_size"]),
-                        "VolumeType": USER_SESSION[user_id]["volume_type"],
+                        "VolumeSize": int(spec["volume_size"]),
+                        "VolumeType": spec["volume_type"],
                     },
                 }
             ],
@@ -139,20 +236,198 @@ def create_instance(user_id: str, request: str) -> str:
                 {
                     "ResourceType": "instance",
                     "Tags": [
-                        {"Key": "Project", "Value": USER_SESSION[user_id]["project"]},
-                        {"Key": "Owner", "Value": USER_SESSION[user_id]["owner"]},
-                        {"Key": "Name", "Value": USER_SESSION[user_id]["name"]},
+                        {"Key": "Project", "Value": spec["project"]},
+                        {"Key": "Owner", "Value": spec["owner"]},
+                        {"Key": "Name", "Value": spec["name"]},
                     ],
                 }
             ],
+            **groups,
         )
         instance_id = response["Instances"][0]["InstanceId"]
-        # Clear the session data after successful creation
+        # Remember this launch as the user's defaults (except the unique name) and clear the form
+        USER_DEFAULTS[user_id] = {field: value for field, value in spec.items() if field != "name"}
         del USER_SESSION[user_id]
-        return f"✅ Successfully launched EC2 instance `{USER_SESSION[user_id]['name']}` with ID `{instance_id}`."
+        prefetch_cache.invalidate()  # A new instance may now match names that were not found before
+        invalidate_fleet_table()
+        return f"✅ Successfully launched EC2 instance `{spec['name']}` with ID `{instance_id}`."
     except Exception as e:
         return f"❌ Error launching instance: {str(e)}"
 
+def parse_instance_request(request: str) -> dict:
+    """
+    Extracts every instance parameter it can find in a free-text request in a single pass.
+
+    Labelled values ("Owner: Asha", "volume_size=50") take precedence over values
+    recognised from their shape (instance types, AMI IDs, OS names, sizes, volume types).
+
+    Returns:
+      dict: Raw (unvalidated) values keyed by field name.
+    """
+    if not request:
+        return {}
+    found = {}
+    text = request.lower()
+    match = INSTANCE_TYPE_PATTERN.search(request)
+    if match:
+        found["instance_type"] = match.group(0)
+    match = AMI_ID_PATTERN.search(request)
+    if match:
+        found["ami"] = match.group(0)
+    else:
+        for os_name in known_os_names():
+            if os_name in text:
+                found["ami"] = os_name
+                break
+    match = SECURITY_GROUP_ID_PATTERN.search(request)
+    if match:
+        found["security_group"] = match.group(0)
+    elif "default security group" in text:
+        found["security_group"] = "default"
+    for volume in VOLUME_TYPES:
+        if volume != "standard" and re.search(rf"\b{volume}\b", text):  # "standard" is too common a word
+            found["volume_type"] = volume
+            break
+    match = VOLUME_SIZE_PATTERN.search(request)
+    if match:
+        found["volume_size"] = match.group("before") or match.group("after")
+    if "use my key" in text and "key_name" not in found:
+        found["key_name"] = "my-key-pair"  # Default key pair name
+    for match in LABELLED_FIELD_PATTERN.finditer(request):
+        label = re.sub(r"[\s_-]+", " ", match.group("label").lower())
+        found[FIELD_LABELS[label]] = match.group("value").strip().strip("\"'")
+    return found
+
+def validate_instance_field(field: str, value, spec: dict = None) -> tuple:
+    """
+    Validates and normalizes a single instance parameter against the known catalog.
+    OS names resolve to the newest indexed AMI matching the architecture of `spec["instance_type"]`.
+
+    Returns:
+      tuple: (normalized value, None) when valid, or (None, error message) when not.
+    """
+    value = str(value).strip()
+    if not value:
+        return None, "value is empty"
+    if field == "instance_type":
+        if not INSTANCE_TYPE_PATTERN.fullmatch(value):
+            return None, f"`{value}` is not a valid instance type (e.g., t3.medium, m5.large)"
+        if catalog.is_ready() and not catalog.get_instance_type(value):
+            return None, f"`{value}` is not offered in {AWS_REGION} (use search_instance_types)"
+        return value.lower(), None
+    if field == "ami":
+        if AMI_ID_PATTERN.fullmatch(value):
+            return value, None
+        if catalog.is_ready():
+            instance_type = catalog.get_instance_type((spec or {}).get("instance_type", ""))
+            architecture = "arm64" if instance_type and "x86_64" not in instance_type["architectures"] else "x86_64"
+            image = catalog.latest_image(value, architecture)
+            if not image:
+                return None, f"`{value}` is not an AMI ID or an indexed OS ({', '.join(catalog.os_names())})"
+            return image["image_id"], None
+        return None, f"the image catalog is still being built, so `{value}` cannot be resolved yet; give an AMI ID or try again shortly"
+    if field == "volume_type":
+        if value.lower() not in VOLUME_TYPES:
+            return None, f"`{value}` is not a volume type ({', '.join(VOLUME_TYPES)})"
+        return value.lower(), None
+    if field == "volume_size":
+        size = re.sub(r"\s*(gib|gb|g)$", "", value.lower())
+        if not size.isdigit() or not 1 <= int(size) <= MAX_VOLUME_SIZE_GB:
+            return None, f"`{value}` is not a size between 1 and {MAX_VOLUME_SIZE_GB} GB"
+        return size, None
+    if len(value) > 255:
+        return None, "value is longer than 255 characters"
+    return value, None
+
+def root_device_name(image_id: str) -> str:
+    """
+    Returns the root device name of an AMI (/dev/xvda for Amazon Linux, /dev/sda1 for Ubuntu,
+    RHEL or Windows), from the catalog or, for images it does not index, from describe_images.
+    """
+    device = catalog.root_device_name(image_id)
+    if device:
+        return device
+    images = ec2.describe_images(ImageIds=[image_id])["Images"]
+    return images[0].get("RootDeviceName", "/dev/xvda") if images else "/dev/xvda"
+
+def known_os_names() -> list:
+    """
+    Returns lower-cased OS names recognised in free text, most specific first.
+    """
+    names = set(OS_NAMES) | {os_name.lower() for os_name in catalog.os_names()}
+    return sorted(names, key=len, reverse=True)
+
+def format_instance_form(spec: dict, missing: list, errors: dict, defaults: dict) -> str:
+    """
+    Renders the instance creation form: collected values, every missing field and any errors.
+
+    Returns:
+      str: A single message asking for all outstanding details at once.
+    """
+    lines = ["**New EC2 instance**"]
+    if spec:
+        lines.append("Collected so far:")
+        lines.extend(f"- {INSTANCE_FIELDS[field]}: `{spec[field]}`" for field in INSTANCE_FIELDS if field in spec)
+    if errors:
+        lines.append("Please correct:")
+        lines.extend(f"- {INSTANCE_FIELDS[field]}: {error}" for field, error in errors.items())
+    outstanding = [field for field in missing if field not in errors]
+    if outstanding:
+        lines.append("Still needed (reply with all of them in one message):")
+        for field in outstanding:
+            hint = f" — default: `{defaults[field]}`" if field in defaults else ""
+            lines.append(f"- {INSTANCE_FIELDS[field]} ({FIELD_HINTS[field]}){hint}")
+        if any(field in defaults for field in outstanding):
+            lines.append('Reply "use defaults" to accept the pre-filled values.')
+    return "\n".join(lines)
+
+@tool
+def search_instance_types(min_vcpus: int = 0, max_vcpus: int = 0, min_memory_gib: float = 0,
+                          max_memory_gib: float = 0, architecture: str = "", family: str = "") -> str:
+    """
+    Searches the local instance type catalog by size and architecture, smallest first.
+
+    Parameters:
+      min_vcpus / max_vcpus (int): vCPU range; 0 means no bound.
+      min_memory_gib / max_memory_gib (float): Memory range in GiB; 0 means no bound.
+      architecture (str): "x86_64" or "arm64"; empty for any.
+      family (str): Instance family such as "t3" or "m7g"; empty for any.
+
+    Returns:
+      A formatted list of matching instance types with vCPUs, memory and architectures.
+    """
+    if not catalog.is_ready():
+        return "⚠️ The instance type catalog is still being built. Please try again shortly."
+    matches = catalog.search_instance_types(min_vcpus, max_vcpus, min_memory_gib, max_memory_gib,
+                                            architecture, family)
+    if not matches:
+        return "❌ No instance types match those requirements."
+    response = "\n".join([
+        f"- **{it['name']}**: {it['vcpus']} vCPU, {it['memory_mib'] / 1024:g} GiB, {it['architectures']}"
+        + (f", {it['gpus']} GPU" if it["gpus"] else "")
+        for it in matches
+    ])
+    return f"**Matching Instance Types:**\n{response}"
+
+@tool
+def search_images(os_name: str = "", architecture: str = "") -> str:
+    """
+    Searches the local AMI catalog by OS name (e.g., "Ubuntu", "Amazon Linux 2023") and architecture.
+
+    Returns:
+      A formatted list of matching AMIs, newest first.
+    """
+    if not catalog.is_ready():
+        return "⚠️ The image catalog is still being built. Please try again shortly."
+    matches = catalog.search_images(os_name, architecture)
+    if not matches:
+        return f"❌ No images found for '{os_name}'. Indexed OSes: {', '.join(catalog.os_names())}"
+    response = "\n".join([
+        f"- **{img['os']}** ({img['architecture']}): `{img['image_id']}` — {img['name']} ({img['creation_date'][:10]})"
+        for img in matches
+    ])
+    return f"**Matching Images:**\n{response}"
+
 @tool
 def list_instances(query: str = "") -> str:
     """
@@ -176,6 +451,84 @@ def list_instances(query: str = "") -> str:
         return "No instances found."
     return "\n".join(response)
 
+@tool
+def fleet_stats(group_by: str = "", filters: str = "", metric: str = "count", top_n: int = 10,
+                sort_by: str = "") -> str:
+    """
+    Answers aggregate questions about the EC2 fleet (counts, capacity, oldest instances) without
+    listing every instance. Use this instead of list_instances for "how many", "per project",
+    "which types" or "top/oldest" questions.
+
+    Parameters:
+      group_by (str): Comma-separated columns to group by, e.g. "state" or "project,instance_type".
+        Columns: state, instance_type, instance_family, availability_zone, platform, name,
+        and any tag key such as project, owner or environment. Empty for a single total.
+      filters (str): Comma-separated conditions, e.g. "state=running, instance_type=t3.medium|t3.large,
+        project!=sandbox, age_days>90". "|" separates alternatives.
+      metric (str): "count", or "sum:vcpus", "sum:memory_gib", "avg:age_days", "max:age_days".
+      top_n (int): Number of groups (or instances) to return.
+      sort_by (str): Instead of grouping, list individual instances ordered by "age_days",
+        "vcpus" or "memory_gib", largest first.
+
+    Returns:
+      A small table with the aggregated result.
+    """
+    table = load_fleet_table()
+    try:
+        conditions = parse_fleet_filters(filters)
+        columns = [column.strip() for column in group_by.split(",") if column.strip()]
+        top_n = max(1, min(int(top_n or 10), 100))
+        if sort_by:
+            result = table.top(sort_by, conditions, top_n)
+        else:
+            result = table.group(columns, conditions, metric.strip().lower() or "count", top_n)
+    except (KeyError, ValueError) as error:
+        return f"❌ {error.args[0]}"
+    if not result["rows"]:
+        return f"No instances match those filters (fleet size: {table.size})."
+    header = " | ".join(result["columns"])
+    lines = [f"| {header} |", "|" + " --- |" * len(result["columns"])]
+    lines += ["| " + " | ".join(str(value) for value in row) + " |" for row in result["rows"]]
+    summary = f"{result['matched']} of {table.size} instances matched"
+    if len(result["rows"]) < result["groups"]:
+        summary += f"; showing top {len(result['rows'])} of {result['groups']}"
+    return f"**Fleet Stats** ({summary}):\n" + "\n".join(lines)
+
+def parse_fleet_filters(filters: str) -> list:
+    """
+    Parses "column=value|value, column>number" filter text into (column, operator, values) tuples.
+
+    Raises:
+      ValueError: If a condition cannot be parsed.
+    """
+    conditions = []
+    for part in filter(None, (part.strip() for part in filters.split(","))):
+        match = FLEET_FILTER_PATTERN.match(part)
+        if not match:
+            raise ValueError(f"Could not understand filter '{part}'. Use e.g. state=running or age_days>30.")
+        column, operator, values = match.groups()
+        conditions.append((column, operator, [value.strip() for value in values.split("|")]))
+    return conditions
+
+def load_fleet_table(max_age: float = FLEET_TABLE_TTL_SECONDS) -> FleetTable:
+    """Returns the cached fleet table, rebuilding it from a paginated describe_instances if stale."""
+    with fleet_table_lock:
+        if FLEET_TABLE["table"] is None or time.monotonic() - FLEET_TABLE["built_at"] > max_age:
+            instances = [
+                instance
+                for page in ec2.get_paginator("describe_instances").paginate()
+                for reservation in page["Reservations"]
+                for instance in reservation["Instances"]
+            ]
+            lookup = catalog.get_instance_type if catalog.is_ready() else None  # vCPU / memory metrics
+            FLEET_TABLE["table"] = FleetTable(instances, instance_type_info=lookup)
+            FLEET_TABLE["built_at"] = time.monotonic()
+        return FLEET_TABLE["table"]
+
+def invalidate_fleet_table():
+    """Forces the next fleet_stats call to reload the inventory (after start/stop/create)."""
+    FLEET_TABLE["table"] = None
+
 @tool
 def start_instance(identifier: str) -> str:
     """
@@ -188,6 +541,8 @@ def start_instance(identifier: str) -> str:
     if not instance_id:
         return f"⚠️ No instance found with identifier: {identifier}"
     ec2.start_instances(InstanceIds=[instance_id])
+    prefetch_cache.invalidate(lambda key: key == ("describe", instance_id))  # Staged state is now stale
+    invalidate_fleet_table()
     return f"✅ Instance {identifier} (ID: {instance_id}) is starting."
 
 @tool
@@ -202,6 +557,8 @@ def stop_instance(identifier: str) -> str:
     if not instance_id:
         return f"⚠️ No instance found with identifier: {identifier}"
     ec2.stop_instances(InstanceIds=[instance_id])
+    prefetch_cache.invalidate(lambda key: key == ("describe", instance_id))  # Staged state is now stale
+    invalidate_fleet_table()
     return f"⛔ Instance {identifier} (ID: {instance_id}) is stopping."
 
 @tool
@@ -217,10 +574,12 @@ def describe_instance(identifier: str) -> str:
     instance_id = get_instance_id(identifier)
     if not instance_id:
         return f"❌ No instance found with identifier '{identifier}'. Please check and try again."
-    response = ec2.describe_instances(InstanceIds=[instance_id])
-    if not response["Reservations"]:
-        return f"❌ No details found for instance '{identifier}'."
-    instance = response["Reservations"][0]["Instances"][0]
+    instance = prefetch_cache.take(("describe", instance_id))  # Served instantly if prefetched
+    if instance is MISS:
+        response = ec2.describe_instances(InstanceIds=[instance_id])
+        if not response["Reservations"]:
+            return f"❌ No details found for instance '{identifier}'."
+        instance = response["Reservations"][0]["Instances"][0]
     volumes = instance.get("BlockDeviceMappings", [])
     storage_details = "\n".join(
         [f"  - Volume ID: {vol['Ebs']['VolumeId']} (Device: {vol['DeviceName']})" for vol in volumes if "Ebs" in vol]
@@ -250,6 +609,9 @@ def get_instance_id(identifier: str) -> str:
     """
     if identifier.startswith("i-"):
         return identifier  # Already an Instance ID
+    staged = prefetch_cache.take(("resolve", identifier))  # Resolved speculatively from the user's message
+    if staged is not MISS:
+        return staged
     instances = ec2.describe_instances()
     for reservation in instances["Reservations"]:
         for instance in reservation["Instances"]:
@@ -260,4 +622,59 @@ def get_instance_id(identifier: str) -> str:
             name = tags.get("Name", "")
             if identifier in [name, private_ip, public_ip, instance_id]:
                 return instance_id
-    return None  # No matching instance found
\ No newline at end of file
+    return None  # No matching instance found
+
+def prefetch_instances(text: str):
+    """
+    Speculatively resolves and describes instances mentioned in a user message.
+
+    Instance IDs, IPs and name-like tokens are extracted locally; the lookup then runs in the
+    background while the model is thinking, and its results are staged so that a following
+    get_instance_id / describe_instance call is answered without another AWS round trip.
+    """
+    # Labelled create-instance values ("key: ops-key", "Name: api-2") name other or new resources
+    text = LABELLED_FIELD_PATTERN.sub(" ", text)
+    found = extract_identifiers(text, ignore=NOT_AN_INSTANCE_NAME_PATTERN)
+    if not any(found.values()):
+        return
+    pending = {}  # staged key -> future completed by the job below
+    for identifier in found["ips"] + found["names"]:
+        pending[("resolve", identifier)] = Future()
+    for instance_id in found["instance_ids"]:
+        pending[("describe", instance_id)] = Future()
+    for key, future in pending.items():
+        prefetch_cache.stage(key, future)
+
+    def job():
+        try:
+            if found["ips"] or found["names"]:
+                pages = ec2.get_paginator("describe_instances").paginate()  # Names and IPs need the full inventory
+            else:
+                pages = ec2.get_paginator("describe_instances").paginate(
+                    Filters=[{"Name": "instance-id", "Values": found["instance_ids"]}])
+            by_identifier = {}
+            for page in pages:
+                for reservation in page["Reservations"]:
+                    for instance in reservation["Instances"]:
+                        tags = {tag["Key"]: tag["Value"] for tag in instance.get("Tags", [])}
+                        for identifier in (tags.get("Name"), instance.get("PrivateIpAddress"),
+                                           instance.get("PublicIpAddress"), instance["InstanceId"]):
+                            if identifier:
+                                by_identifier.setdefault(identifier, instance)
+            for (kind, identifier), future in pending.items():
+                instance = by_identifier.get(identifier)
+                if kind == "resolve":
+                    future.set_result(instance["InstanceId"] if instance else None)
+                    if instance:
+                        prefetch_cache.stage(("describe", instance["InstanceId"]), instance)
+                elif instance:
+                    future.set_result(instance)
+                else:
+                    future.set_exception(LookupError(identifier))  # Let describe_instance report it live
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            raise
+
+    prefetch_cache.submit(job)
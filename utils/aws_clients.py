@@ -0,0 +1,104 @@
+import os  # Read client tuning from environment variables
+import threading  # Guard client creation and counters across worker threads
+import boto3  # AWS SDK for Python
+from botocore.config import Config  # Per-client connection, retry and timeout settings
+
+# Default AWS region used when a tool does not ask for a specific one
+DEFAULT_REGION = os.getenv("AWS_REGION", "ap-south-1")
+
+# Tuning knobs; defaults sized for a handful of concurrent tool calls per worker
+MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "5"))
+CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "20"))
+
+# Error codes AWS uses to signal request throttling
+THROTTLING_ERROR_CODES = {
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottled",
+    "RequestThrottledException", "TooManyRequestsException", "RequestLimitExceeded",
+    "SlowDown", "EC2ThrottledException", "ProvisionedThroughputExceededException",
+}
+
+CLIENT_CONFIG = Config(
+    max_pool_connections=MAX_POOL_CONNECTIONS,  # Size the urllib3 pool for concurrent tool calls
+    retries={"mode": "adaptive", "max_attempts": MAX_ATTEMPTS},  # Client-side rate limiting plus backoff
+    connect_timeout=CONNECT_TIMEOUT,  # Fail fast when the endpoint is unreachable
+    read_timeout=READ_TIMEOUT,  # Never hang a worker on a stalled response
+)
+
+_lock = threading.Lock()
+_session = None  # boto3 sessions are not thread-safe, so one is created and only used under the lock
+_clients = {}  # (service, region) -> client; botocore clients are safe to share between threads
+_stats = {}  # (service, region) -> counters
+
+
+def _count_throttles(key):
+    """
+    Builds a `needs-retry` event handler that counts throttled and retried calls for a client.
+    """
+    def handler(response=None, attempts=None, **kwargs):
+        if response is None:
+            return None  # Connection-level error, not a throttle
+        parsed = response[1] if isinstance(response, tuple) else {}
+        code = parsed.get("Error", {}).get("Code", "")
+        with _lock:
+            counters = _stats[key]
+            if code in THROTTLING_ERROR_CODES:
+                counters["throttled"] += 1
+            if code:
+                counters["errors"] += 1
+        return None  # Leave the retry decision to botocore
+    return handler
+
+
+def _count_calls(key):
+    """
+    Builds a `before-call` event handler that counts API calls made through a client.
+    """
+    def handler(**kwargs):
+        with _lock:
+            _stats[key]["calls"] += 1
+    return handler
+
+
+def get_client(service: str = "ec2", region: str = None):
+    """
+    Returns a shared, tuned boto3 client for the given service and region.
+
+    Clients are created once per (service, region) pair and reused by every tool module,
+    so they share one connection pool with adaptive retries and explicit timeouts.
+
+    Parameters:
+      service (str): AWS service name, e.g. "ec2".
+      region (str): AWS region; defaults to DEFAULT_REGION.
+
+    Returns:
+      A botocore client instance.
+    """
+    global _session
+    key = (service, region or DEFAULT_REGION)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        if key not in _clients:
+            if _session is None:
+                _session = boto3.session.Session()
+            client = _session.client(service, region_name=key[1], config=CLIENT_CONFIG)
+            _stats[key] = {"calls": 0, "errors": 0, "throttled": 0}
+            event_name = client.meta.service_model.service_id.hyphenize()  # Event names use the hyphenated service id
+            client.meta.events.register(f"before-call.{event_name}", _count_calls(key))
+            client.meta.events.register(f"needs-retry.{event_name}", _count_throttles(key))
+            _clients[key] = client
+        return _clients[key]
+
+
+def get_client_stats() -> dict:
+    """
+    Returns call, error and throttling counters for every client created so far.
+
+    Returns:
+      dict: Mapping of "service/region" to its counters.
+    """
+    with _lock:
+        return {f"{service}/{region}": dict(counters) for (service, region), counters in _stats.items()}
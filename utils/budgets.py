@@ -0,0 +1,138 @@
+import asyncio  # Cancellation of in-flight agent runs
+import os  # Environment configuration
+import time  # Monotonic deadlines
+from langchain_core.messages import AIMessage, ToolMessage  # Message types inspected for usage
+
+# Server-side limits per request; clients may ask for tighter ones, never looser
+REQUEST_DEADLINE_SECONDS = float(os.getenv("AGENT_REQUEST_DEADLINE_SECONDS", "120"))
+MAX_TOOL_CALLS = int(os.getenv("AGENT_MAX_TOOL_CALLS", "12"))
+MAX_TOKENS = int(os.getenv("AGENT_MAX_TOKENS", "60000"))
+DISCONNECT_POLL_SECONDS = 1.0  # How often to check whether the HTTP client is still there
+PARTIAL_RESULT_CHARS = 1500  # How much of the latest tool output to include in a partial answer
+
+
+class RequestBudget:
+    """
+    Wall-clock deadline plus tool-call and token budgets for one agent request.
+
+    The budget travels in the graph config (`configurable.budget`) so that every node can
+    check it; see `get_budget`.
+    """
+
+    def __init__(self, deadline_seconds: float = REQUEST_DEADLINE_SECONDS, max_tool_calls: int = MAX_TOOL_CALLS,
+                 max_tokens: int = MAX_TOKENS):
+        self.deadline_seconds = deadline_seconds
+        self.deadline = time.monotonic() + deadline_seconds
+        self.max_tool_calls = max_tool_calls
+        self.max_tokens = max_tokens
+        self.tokens_used = 0  # Counted as responses arrive; the history's usage metadata gets cleared
+
+    @classmethod
+    def from_request(cls, body: dict) -> "RequestBudget":
+        """
+        Builds a budget from optional `deadline_seconds`, `max_tool_calls` and `max_tokens`
+        request fields, capped at the server limits.
+        """
+        def capped(key, limit, cast):
+            try:
+                return min(cast(body.get(key, limit)), limit)
+            except (TypeError, ValueError):
+                return limit
+        return cls(
+            deadline_seconds=capped("deadline_seconds", REQUEST_DEADLINE_SECONDS, float),
+            max_tool_calls=capped("max_tool_calls", MAX_TOOL_CALLS, int),
+            max_tokens=capped("max_tokens", MAX_TOKENS, int),
+        )
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def config(self) -> dict:
+        """Graph config entries carrying this budget, with a matching recursion limit as a backstop."""
+        return {
+            "configurable": {"budget": self},
+            "recursion_limit": 2 * self.max_tool_calls + 10,
+        }
+
+    def record_usage(self, response):
+        """Adds a model response's token usage to the running total."""
+        self.tokens_used += (getattr(response, "usage_metadata", None) or {}).get("total_tokens", 0)
+
+    def exceeded(self, messages: list, pending_tool_calls: int = 0) -> str:
+        """
+        Returns why the request is over budget, or None.
+
+        Parameters:
+          messages (list): The request's conversation so far.
+          pending_tool_calls (int): Tool calls the model just asked for but that have not run yet.
+        """
+        if self.remaining() <= 0:
+            return f"the {self.deadline_seconds:g}s time limit was reached"
+        tool_calls = sum(len(msg.tool_calls) for msg in messages if isinstance(msg, AIMessage) and msg.tool_calls)
+        if tool_calls + pending_tool_calls > self.max_tool_calls:
+            return f"the limit of {self.max_tool_calls} tool calls was reached"
+        if self.tokens_used > self.max_tokens:
+            return f"the limit of {self.max_tokens} tokens was reached"
+        return None
+
+
+def get_budget(config: dict) -> RequestBudget:
+    """Returns the budget stored in a graph config, or a default one."""
+    return (config or {}).get("configurable", {}).get("budget") or RequestBudget()
+
+
+def partial_answer(messages: list, reason: str, draft: str = "") -> AIMessage:
+    """
+    Builds the final answer returned when a budget is hit: the reason, any text the model had
+    already produced, and the latest tool result so the user still gets what was found.
+    """
+    parts = [f"⚠️ I stopped before finishing because {reason}."]
+    if draft:
+        parts.append(draft)
+    latest_result = next((msg for msg in reversed(messages) if isinstance(msg, ToolMessage)), None)
+    if latest_result is not None:
+        content = str(latest_result.content)
+        if len(content) > PARTIAL_RESULT_CHARS:
+            content = content[:PARTIAL_RESULT_CHARS].rsplit("\n", 1)[0] + "\n…"
+        parts.append(f"Here is what I found so far:\n{content}")
+    # Marked so streaming endpoints can tell this synthesized answer apart from model output
+    return AIMessage(content="\n\n".join(parts), response_metadata={"finish_reason": "budget_exceeded"})
+
+
+async def run_until_disconnected(request, awaitable):
+    """
+    Awaits `awaitable` as a task and cancels it, propagating cancellation into in-flight model
+    and tool calls, if the HTTP client disconnects first.
+
+    Returns:
+      The awaitable's result, or None if the client went away.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                return None
+    finally:
+        if not task.done():
+            task.cancel()  # Our own caller was cancelled
+
+
+async def stream_until_disconnected(request, events):
+    """
+    Relays the items of the async generator `events`, cancelling it if the HTTP client
+    disconnects. Servers only report a disconnect to a streaming response when a write fails,
+    which never happens while the agent is still thinking and has nothing to send.
+    """
+    while True:
+        try:
+            item = await run_until_disconnected(request, events.__anext__())
+        except StopAsyncIteration:
+            return
+        if item is None:
+            return  # Client went away; the cancelled step closed the generator
+        yield item
@@ -1,4 +1,7 @@
+import time
 from langchain.callbacks.base import BaseCallbackHandler
+from langchain_core.messages import message_to_dict
+from utils.traffic import MESSAGE_IDENTITY_KEYS, anonymize, current_record
 
 class CustomCallbackHandler(BaseCallbackHandler):
     def __init__(self):
@@ -21,3 +24,44 @@ class CustomCallbackHandler(BaseCallbackHandler):
 
     def get_intermediate_steps(self):
         return self.intermediate_steps
+
+
+class RecordingCallbackHandler(BaseCallbackHandler):
+    """
+    Attaches model responses and tool outputs, with their latency, to a traffic record
+    (see utils.traffic) so the request can later be replayed against stubbed backends.
+    """
+    def __init__(self, record):
+        self.record = record
+        self.started = {}  # run_id -> (start time, tool name, tool input)
+
+    def on_chat_model_start(self, serialized, messages, run_id=None, **kwargs):
+        self.started[run_id] = (time.perf_counter(), None, None)
+
+    def on_llm_end(self, response, run_id=None, **kwargs):
+        started_at = self.started.pop(run_id, (time.perf_counter(), None, None))[0]
+        for generation in response.generations[0]:
+            self.record["model_calls"].append({
+                "message": anonymize(message_to_dict(generation.message), identity_keys=MESSAGE_IDENTITY_KEYS),
+                "latency": time.perf_counter() - started_at,
+            })
+
+    def on_tool_start(self, serialized, input_str, run_id=None, inputs=None, **kwargs):
+        self.started[run_id] = (time.perf_counter(), serialized.get("name"), inputs)
+
+    def on_tool_end(self, output, run_id=None, **kwargs):
+        started_at, name, inputs = self.started.pop(run_id, (time.perf_counter(), None, None))
+        self.record["tool_calls"].append({
+            "tool": name,
+            "input": anonymize(inputs, identity_keys=MESSAGE_IDENTITY_KEYS),
+            "output": anonymize(str(getattr(output, "content", output)), identity_keys=MESSAGE_IDENTITY_KEYS),
+            "latency": time.perf_counter() - started_at,
+        })
+
+
+def recording_callbacks() -> list:
+    """
+    Returns a RecordingCallbackHandler for the request being recorded, or an empty list.
+    """
+    record = current_record.get()
+    return [RecordingCallbackHandler(record)] if record is not None else []
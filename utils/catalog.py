@@ -0,0 +1,250 @@
+import os  # File paths and environment configuration
+import sqlite3  # Compact on-disk index queried locally in milliseconds
+import tempfile  # Per-refresh temp files for the atomic swap
+import threading  # Serialize access to the shared connection and run periodic refreshes
+import time  # Snapshot age tracking
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOG_DB_PATH = os.getenv("CATALOG_DB_PATH", os.path.join(BASE_DIR, "..", "data", "catalog.sqlite"))
+CATALOG_MAX_AGE_SECONDS = int(os.getenv("CATALOG_MAX_AGE_SECONDS", "86400"))  # Re-snapshot once a day
+IMAGES_PER_OS = 3  # Keep only the newest few images per OS and architecture to stay compact
+
+# Public image families snapshotted into the index: (OS name, owner account, AMI name filter)
+IMAGE_SOURCES = [
+    ("Amazon Linux 2023", "amazon", "al2023-ami-2023.*"),
+    ("Amazon Linux 2", "amazon", "amzn2-ami-hvm-*-gp2"),
+    ("Ubuntu 24.04", "099720109477", "ubuntu/images/hvm-ssd-gp3/ubuntu-noble-24.04-*"),
+    ("Ubuntu 22.04", "099720109477", "ubuntu/images/hvm-ssd/ubuntu-jammy-22.04-*"),
+    ("Debian 12", "136693071363", "debian-12-*"),
+    ("RHEL 9", "309956199498", "RHEL-9.*_HVM-*"),
+    ("Windows Server 2022", "amazon", "Windows_Server-2022-English-Full-Base-*"),
+]
+
+SCHEMA = """
+CREATE TABLE instance_types (
+    name TEXT PRIMARY KEY,
+    family TEXT NOT NULL,
+    vcpus INTEGER NOT NULL,
+    memory_mib INTEGER NOT NULL,
+    architectures TEXT NOT NULL,
+    gpus INTEGER NOT NULL,
+    current_generation INTEGER NOT NULL
+);
+CREATE INDEX idx_instance_types_size ON instance_types (vcpus, memory_mib);
+CREATE TABLE images (
+    image_id TEXT PRIMARY KEY,
+    os TEXT NOT NULL,
+    name TEXT NOT NULL,
+    architecture TEXT NOT NULL,
+    creation_date TEXT NOT NULL,
+    root_device_name TEXT NOT NULL
+);
+CREATE INDEX idx_images_os ON images (os, architecture, creation_date);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+class CatalogIndex:
+    """
+    Local snapshot of the EC2 instance type and AMI catalogs stored in SQLite.
+
+    `refresh` pages through `describe_instance_types` and `describe_images` once, writes a
+    new database file next to the current one and atomically swaps it in, so searches never
+    wait on live API calls and never see a half-written snapshot.
+    """
+
+    def __init__(self, path: str = CATALOG_DB_PATH):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._refresh_thread = None
+
+    def _connection(self):
+        # Open lazily; returns None until a snapshot has been written
+        if self._conn is None and os.path.exists(self.path):
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+        return self._conn
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return []
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def is_ready(self) -> bool:
+        """Returns True once a snapshot is available on disk."""
+        with self._lock:
+            return self._connection() is not None
+
+    def age(self) -> float:
+        """Returns the snapshot age in seconds, or infinity if there is none."""
+        rows = self._query("SELECT value FROM meta WHERE key = 'refreshed_at'")
+        return time.time() - float(rows[0]["value"]) if rows else float("inf")
+
+    def refresh(self, ec2) -> dict:
+        """
+        Snapshots instance types and public images from AWS into a fresh index file.
+
+        Parameters:
+          ec2: A boto3 EC2 client.
+
+        Returns:
+          dict: Number of instance types and images written.
+        """
+        instance_types = []
+        for page in ec2.get_paginator("describe_instance_types").paginate():
+            for item in page["InstanceTypes"]:
+                name = item["InstanceType"]
+                instance_types.append((
+                    name,
+                    name.split(".")[0],
+                    item["VCpuInfo"]["DefaultVCpus"],
+                    item["MemoryInfo"]["SizeInMiB"],
+                    ",".join(item.get("ProcessorInfo", {}).get("SupportedArchitectures", [])),
+                    sum(gpu.get("Count", 0) for gpu in item.get("GpuInfo", {}).get("Gpus", [])),
+                    int(item.get("CurrentGeneration", False)),
+                ))
+        images = []
+        for os_name, owner, pattern in IMAGE_SOURCES:
+            response = ec2.describe_images(
+                Owners=[owner],
+                Filters=[
+                    {"Name": "name", "Values": [pattern]},
+                    {"Name": "state", "Values": ["available"]},
+                ],
+            )
+            newest = {}  # architecture -> images, newest first
+            for image in sorted(response["Images"], key=lambda img: img["CreationDate"], reverse=True):
+                bucket = newest.setdefault(image["Architecture"], [])
+                if len(bucket) < IMAGES_PER_OS:
+                    bucket.append((image["ImageId"], os_name, image.get("Name", ""),
+                                   image["Architecture"], image["CreationDate"],
+                                   image.get("RootDeviceName", "/dev/xvda")))
+            for bucket in newest.values():
+                images.extend(bucket)
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Unique temp file in the same directory: several processes may refresh at once
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".", suffix=".tmp",
+                                        dir=os.path.dirname(self.path))
+        os.close(fd)
+        try:
+            conn = sqlite3.connect(tmp_path)
+            try:
+                conn.executescript(SCHEMA)
+                conn.executemany("INSERT INTO instance_types VALUES (?, ?, ?, ?, ?, ?, ?)", instance_types)
+                conn.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)", images)
+                conn.execute("INSERT INTO meta VALUES ('refreshed_at', ?)", (str(time.time()),))
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        with self._lock:
+            os.replace(tmp_path, self.path)  # Atomic swap; open readers keep the old snapshot
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        return {"instance_types": len(instance_types), "images": len(images)}
+
+    def refresh_if_stale(self, ec2, max_age: float = CATALOG_MAX_AGE_SECONDS) -> bool:
+        """Refreshes the snapshot when it is missing or older than `max_age` seconds."""
+        if self.age() < max_age:
+            return False
+        self.refresh(ec2)
+        return True
+
+    def start_background_refresh(self, ec2, interval: float = CATALOG_MAX_AGE_SECONDS):
+        """
+        Starts a daemon thread that keeps the snapshot at most `interval` seconds old.
+        Errors are logged and retried on the next cycle so the service keeps serving the old index.
+        """
+        if self._refresh_thread is not None:
+            return
+
+        def loop():
+            while True:
+                try:
+                    self.refresh_if_stale(ec2, interval)
+                except Exception as e:
+                    print(f"Catalog refresh failed: {e}")  # Keep serving the previous snapshot
+                time.sleep(min(interval, 3600))
+
+        self._refresh_thread = threading.Thread(target=loop, name="catalog-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def get_instance_type(self, name: str) -> dict:
+        """Returns the catalog entry for an instance type, or None if it is unknown."""
+        rows = self._query("SELECT * FROM instance_types WHERE name = ?", (name.lower(),))
+        return rows[0] if rows else None
+
+    def search_instance_types(self, min_vcpus: int = 0, max_vcpus: int = 0, min_memory_gib: float = 0,
+                              max_memory_gib: float = 0, architecture: str = "", family: str = "",
+                              limit: int = 20) -> list:
+        """
+        Finds current-generation instance types matching the given size and architecture,
+        smallest first.
+        """
+        clauses, params = ["current_generation = 1"], []
+        if min_vcpus:
+            clauses.append("vcpus >= ?")
+            params.append(min_vcpus)
+        if max_vcpus:
+            clauses.append("vcpus <= ?")
+            params.append(max_vcpus)
+        if min_memory_gib:
+            clauses.append("memory_mib >= ?")
+            params.append(int(min_memory_gib * 1024))
+        if max_memory_gib:
+            clauses.append("memory_mib <= ?")
+            params.append(int(max_memory_gib * 1024))
+        if architecture:
+            clauses.append("instr(architectures, ?) > 0")
+            params.append(architecture.lower())
+        if family:
+            clauses.append("family = ?")
+            params.append(family.lower())
+        sql = (f"SELECT * FROM instance_types WHERE {' AND '.join(clauses)} "
+               "ORDER BY vcpus, memory_mib, name LIMIT ?")
+        return self._query(sql, (*params, limit))
+
+    def os_names(self) -> list:
+        """Returns the OS names present in the image index."""
+        return [row["os"] for row in self._query("SELECT DISTINCT os FROM images ORDER BY os")]
+
+    def search_images(self, os_name: str = "", architecture: str = "", limit: int = 10) -> list:
+        """Finds indexed images whose OS or AMI name contains `os_name`, newest first."""
+        clauses, params = [], []
+        if os_name:
+            clauses.append("(os LIKE ? OR name LIKE ?)")
+            params.extend([f"%{os_name}%", f"%{os_name}%"])
+        if architecture:
+            clauses.append("architecture = ?")
+            params.append(architecture)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(f"SELECT * FROM images {where} ORDER BY creation_date DESC LIMIT ?",
+                           (*params, limit))
+
+    def latest_image(self, os_name: str, architecture: str = "x86_64") -> dict:
+        """Returns the newest indexed image for an OS name, or None."""
+        rows = self.search_images(os_name, architecture, limit=1)
+        return rows[0] if rows else None
+
+    def root_device_name(self, image_id: str) -> str:
+        """Returns the root device (e.g. /dev/xvda, /dev/sda1) of an indexed image, or None."""
+        try:
+            rows = self._query("SELECT root_device_name FROM images WHERE image_id = ?", (image_id,))
+        except sqlite3.OperationalError:
+            return None  # Snapshot written before the column existed; replaced on the next refresh
+        return rows[0]["root_device_name"] if rows else None
+
+    def stats(self) -> dict:
+        """Returns snapshot age and row counts for the metrics endpoint."""
+        counts = self._query(
+            "SELECT (SELECT COUNT(*) FROM instance_types) AS instance_types, (SELECT COUNT(*) FROM images) AS images"
+        )
+        age = self.age()
+        return {**(counts[0] if counts else {}), "age_seconds": None if age == float("inf") else round(age)}
@@ -0,0 +1,219 @@
+import numpy as np  # Columnar storage and vectorized group-by
+
+# Friendly column names accepted in queries
+COLUMN_ALIASES = {
+    "type": "instance_type", "instance type": "instance_type", "size": "instance_type",
+    "zone": "availability_zone", "az": "availability_zone", "availability zone": "availability_zone",
+    "id": "instance_id", "status": "state", "os": "platform", "family": "instance_family",
+}
+NUMERIC_METRICS = ("vcpus", "memory_gib", "age_days")
+CAPACITY_METRICS = ("vcpus", "memory_gib")  # Need the instance type catalog
+
+
+def column_key(name: str) -> str:
+    """Normalizes a column or tag name: lower-cased, whitespace runs replaced by "_"."""
+    return "_".join(name.strip().lower().split())
+
+
+class FleetTable:
+    """
+    Column-oriented snapshot of the EC2 inventory for local aggregate queries.
+
+    Text columns are dictionary-encoded (`codes` into `categories`) so filters and group-bys
+    run as vectorized integer operations; numeric columns are float arrays. Every tag becomes
+    a column named after its normalized key (e.g. "project", "cost_center" for "Cost Center").
+    """
+
+    def __init__(self, instances: list, instance_type_info=None, now: float = None):
+        """
+        Parameters:
+          instances (list): Instance dicts as returned by describe_instances.
+          instance_type_info: Optional callable mapping an instance type to a dict with
+            "vcpus" and "memory_mib" (e.g. the local catalog), used for capacity metrics.
+          now (float): Reference UNIX time for instance ages; defaults to the current time.
+        """
+        rows = []
+        tag_keys = set()
+        for instance in instances:
+            tags = {column_key(tag["Key"]): tag["Value"] for tag in instance.get("Tags", [])}
+            tag_keys.update(tags)
+            instance_type = instance.get("InstanceType", "")
+            rows.append({
+                "instance_id": instance["InstanceId"],
+                "name": tags.get("name", ""),
+                "state": instance.get("State", {}).get("Name", ""),
+                "instance_type": instance_type,
+                "instance_family": instance_type.split(".")[0],
+                "availability_zone": instance.get("Placement", {}).get("AvailabilityZone", ""),
+                "platform": instance.get("PlatformDetails", instance.get("Platform", "Linux/UNIX")),
+                "private_ip": instance.get("PrivateIpAddress", ""),
+                "public_ip": instance.get("PublicIpAddress", ""),
+                "launch_time": instance.get("LaunchTime"),
+                "tags": tags,
+            })
+        self.size = len(rows)
+        self.has_capacity = instance_type_info is not None
+        text_columns = ["instance_id", "name", "state", "instance_type", "instance_family", "availability_zone",
+                        "platform", "private_ip", "public_ip"]
+        self.columns = {}  # name -> (codes, categories)
+        for column in text_columns:
+            self._add_text_column(column, [row[column] for row in rows])
+        for key in sorted(tag_keys - set(self.columns)):
+            self._add_text_column(key, [row["tags"].get(key, "") for row in rows])
+
+        now = now if now is not None else np.datetime64("now", "s").astype(float)
+        launch = np.array([_timestamp(row["launch_time"]) for row in rows], dtype=float)
+        self.numeric = {"launch_time": launch, "age_days": (now - launch) / 86400}
+        vcpus = np.full(self.size, np.nan)
+        memory = np.full(self.size, np.nan)
+        if instance_type_info is not None:
+            for index, row in enumerate(rows):
+                info = instance_type_info(row["instance_type"]) if row["instance_type"] else None
+                if info:
+                    vcpus[index] = info["vcpus"]
+                    memory[index] = info["memory_mib"] / 1024
+        self.numeric["vcpus"] = vcpus
+        self.numeric["memory_gib"] = memory
+
+    def _add_text_column(self, name: str, values: list):
+        categories, codes = np.unique(np.array(values, dtype=object).astype(str), return_inverse=True)
+        self.columns[name] = (codes.astype(np.int32), categories)
+
+    def resolve_column(self, name: str) -> str:
+        """Maps a user-facing column name to a stored column, raising KeyError if unknown."""
+        key = name.strip().lower().removeprefix("tag:").strip()
+        key = column_key(COLUMN_ALIASES.get(key, key))
+        if key not in self.columns and key not in self.numeric:
+            raise KeyError(f"Unknown column '{name}'. Available: {', '.join(self.available_columns())}")
+        return key
+
+    def available_columns(self) -> list:
+        return sorted(self.columns) + [column for column in NUMERIC_METRICS if column in self.numeric]
+
+    def numeric_column(self, name: str) -> str:
+        """Resolves a column used as a metric or sort key, raising ValueError if it has no numbers."""
+        column = self.resolve_column(name)
+        if column not in self.numeric:
+            raise ValueError(f"'{column}' is not numeric; metrics and sort_by take one of {', '.join(NUMERIC_METRICS)}.")
+        if column in CAPACITY_METRICS and not self.has_capacity:
+            raise ValueError(f"No {column} data yet: the instance type catalog is still being built. "
+                             f"Try again in a minute, or use metric=count.")
+        return column
+
+    def mask(self, filters: list) -> np.ndarray:
+        """
+        Builds a row mask from (column, operator, values) filters. Operators: "=", "!=", ">", "<".
+        Text comparisons are case-insensitive; ">"/"<" apply to numeric columns.
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for column, operator, values in filters:
+            column = self.resolve_column(column)
+            if column in self.numeric:
+                data = self.numeric[self.numeric_column(column)]
+                threshold = float(values[0])
+                if operator == ">":
+                    mask &= data > threshold
+                elif operator == "<":
+                    mask &= data < threshold
+                else:
+                    hit = np.isclose(data, threshold)
+                    mask &= hit if operator == "=" else ~hit
+                continue
+            codes, categories = self.columns[column]
+            wanted = {value.lower() for value in values}
+            wanted_codes = np.flatnonzero([category.lower() in wanted for category in categories])
+            hit = np.isin(codes, wanted_codes)
+            mask &= hit if operator == "=" else ~hit
+        return mask
+
+    def group(self, group_by: list, filters: list = (), metric: str = "count", top_n: int = 10) -> dict:
+        """
+        Aggregates matching instances by one or more columns.
+
+        Parameters:
+          group_by (list): Column names; empty for a single total.
+          filters (list): (column, operator, values) tuples, see `mask`.
+          metric (str): "count", or "sum:<col>" / "avg:<col>" / "max:<col>" for vcpus, memory_gib, age_days.
+          top_n (int): Number of groups to return, largest first.
+
+        Returns:
+          dict: {"columns": [...], "rows": [(group values..., value)], "groups": total groups, "matched": rows}
+        """
+        mask = self.mask(filters)
+        columns = [self.resolve_column(column) for column in group_by]
+        for column in columns:
+            if column in self.numeric:
+                raise ValueError(f"Cannot group by numeric column '{column}'; use it in metric (e.g. sum:{column}), "
+                                 f"sort_by or a filter such as {column}>4.")
+        aggregate, _, metric_column = metric.partition(":")
+        if aggregate not in ("count", "sum", "avg", "max"):
+            raise ValueError(f"Unknown metric '{metric}'. Use count, sum:<column>, avg:<column> or max:<column>.")
+        if aggregate != "count":
+            metric_column = self.numeric_column(metric_column)
+        values = np.ones(self.size) if aggregate == "count" else self.numeric[metric_column]
+        selected = np.flatnonzero(mask & ~np.isnan(values))
+        if mask.any() and not selected.size:
+            raise ValueError(f"None of the {int(mask.sum())} matching instances has a {metric_column} value.")
+        if not columns:
+            return {"columns": [metric], "rows": [(_aggregate(aggregate, values[selected]),)] if selected.size else [],
+                    "groups": 1, "matched": int(mask.sum())}
+        # Combine the per-column codes into one integer key per row, then aggregate with bincount
+        key = np.zeros(selected.size, dtype=np.int64)
+        for column in columns:
+            codes, categories = self.columns[column]
+            key = key * len(categories) + codes[selected]
+        group_keys, inverse = np.unique(key, return_inverse=True)
+        sums = np.bincount(inverse, weights=values[selected], minlength=group_keys.size)
+        if aggregate == "avg":
+            result = sums / np.bincount(inverse, minlength=group_keys.size)
+        elif aggregate == "max":
+            result = np.full(group_keys.size, -np.inf)
+            np.maximum.at(result, inverse, values[selected])
+        else:
+            result = sums
+        order = np.argsort(-result, kind="stable")[:top_n]
+        rows = []
+        for index in order:
+            labels, remainder = [], int(group_keys[index])
+            for column in reversed(columns):
+                codes, categories = self.columns[column]
+                remainder, code = divmod(remainder, len(categories))
+                labels.append(str(categories[code]) or "(none)")
+            rows.append((*reversed(labels), _round(result[index])))
+        return {"columns": columns + [metric], "rows": rows, "groups": int(group_keys.size), "matched": int(mask.sum())}
+
+    def top(self, sort_by: str, filters: list = (), top_n: int = 10, ascending: bool = False,
+            show: tuple = ("name", "instance_id", "state", "instance_type")) -> dict:
+        """Returns the top-N matching instances ordered by a numeric column (e.g. oldest by age_days)."""
+        mask = self.mask(filters)
+        column = self.numeric_column(sort_by)
+        data = self.numeric[column]
+        selected = np.flatnonzero(mask & ~np.isnan(data))
+        if mask.any() and not selected.size:
+            raise ValueError(f"None of the {int(mask.sum())} matching instances has a {column} value.")
+        order = selected[np.argsort(data[selected] if ascending else -data[selected], kind="stable")][:top_n]
+        rows = [tuple(str(self.columns[name][1][self.columns[name][0][index]]) for name in show)
+                + (_round(data[index]),) for index in order]
+        return {"columns": list(show) + [column], "rows": rows, "groups": int(selected.size),
+                "matched": int(mask.sum())}
+
+
+def _timestamp(value) -> float:
+    if value is None:
+        return np.nan
+    if hasattr(value, "timestamp"):
+        return value.timestamp()
+    return np.datetime64(str(value).replace("Z", "").split("+")[0], "s").astype(float)
+
+
+def _aggregate(aggregate: str, values: np.ndarray):
+    if aggregate == "avg":
+        return _round(values.mean())
+    if aggregate == "max":
+        return _round(values.max())
+    return _round(values.sum())
+
+
+def _round(value):
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 2)
@@ -0,0 +1,162 @@
+import asyncio  # Warm-up and periodic keep-alive pings
+import importlib.util  # Detect whether the HTTP/2 extra is installed
+import os  # Read transport tuning from environment variables
+import threading  # Guard client creation and counters
+import httpx  # HTTP client shared by every ChatOpenAI instance
+
+# OpenAI endpoint the shared clients talk to (same variable the OpenAI SDK reads)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+
+# Tuning knobs; defaults sized for one worker issuing a handful of concurrent model calls
+MODEL_HTTP2 = os.getenv("MODEL_HTTP2", "true").lower() in ("1", "true", "yes")
+MODEL_MAX_CONNECTIONS = int(os.getenv("MODEL_MAX_CONNECTIONS", "20"))
+MODEL_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("MODEL_MAX_KEEPALIVE_CONNECTIONS", "10"))
+MODEL_KEEPALIVE_EXPIRY = float(os.getenv("MODEL_KEEPALIVE_EXPIRY", "120"))  # Idle seconds before a pooled connection is dropped
+MODEL_CONNECT_TIMEOUT = float(os.getenv("MODEL_CONNECT_TIMEOUT", "5"))
+MODEL_READ_TIMEOUT = float(os.getenv("MODEL_READ_TIMEOUT", "120"))  # Long completions stream for a while
+MODEL_KEEPALIVE_INTERVAL = float(os.getenv("MODEL_KEEPALIVE_INTERVAL", "45"))  # 0 disables the background ping
+
+# HTTP/2 needs the `h2` package (httpx[http2]); fall back to pooled HTTP/1.1 without it
+HTTP2_ENABLED = MODEL_HTTP2 and importlib.util.find_spec("h2") is not None
+
+LIMITS = httpx.Limits(
+    max_connections=MODEL_MAX_CONNECTIONS,
+    max_keepalive_connections=MODEL_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=MODEL_KEEPALIVE_EXPIRY,
+)
+TIMEOUT = httpx.Timeout(MODEL_READ_TIMEOUT, connect=MODEL_CONNECT_TIMEOUT)
+
+_lock = threading.Lock()
+_clients = {}  # "sync" / "async" -> shared httpx client
+_stats = {"requests": 0, "connections_opened": 0, "warmups": 0, "pings": 0, "ping_errors": 0}
+
+
+def _count(counter: str):
+    with _lock:
+        _stats[counter] += 1
+
+
+def _trace(event_name, info):
+    # httpcore reports every new TCP connection; requests without one reused a pooled connection
+    if event_name == "connection.connect_tcp.complete":
+        _count("connections_opened")
+
+
+async def _async_trace(event_name, info):
+    _trace(event_name, info)
+
+
+def _on_request(request):
+    _count("requests")
+    request.extensions["trace"] = _trace
+
+
+async def _on_async_request(request):
+    _count("requests")
+    request.extensions["trace"] = _async_trace
+
+
+def get_http_client() -> httpx.Client:
+    """Returns the process-wide synchronous client used for blocking model calls."""
+    with _lock:
+        if "sync" not in _clients:
+            _clients["sync"] = httpx.Client(http2=HTTP2_ENABLED, limits=LIMITS, timeout=TIMEOUT,
+                                            event_hooks={"request": [_on_request]})
+        return _clients["sync"]
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Returns the process-wide asynchronous client used for `ainvoke` / `astream` model calls."""
+    with _lock:
+        if "async" not in _clients:
+            _clients["async"] = httpx.AsyncClient(http2=HTTP2_ENABLED, limits=LIMITS, timeout=TIMEOUT,
+                                                  event_hooks={"request": [_on_async_request]})
+        return _clients["async"]
+
+
+def chat_model_transport() -> dict:
+    """
+    Keyword arguments that make a ChatOpenAI instance use the shared, pooled clients,
+    e.g. `ChatOpenAI(model="gpt-4", **chat_model_transport())`.
+
+    `stream_usage` is set explicitly because ChatOpenAI only turns it on by default when it
+    creates its own clients; without it streamed calls report no token usage.
+    """
+    return {"http_client": get_http_client(), "http_async_client": get_async_http_client(), "stream_usage": True}
+
+
+def _ping_request() -> dict:
+    # Any response, even a 401, proves the connection is open; the body is irrelevant
+    api_key = os.getenv("OPENAI_API_KEY")
+    return {"url": f"{OPENAI_BASE_URL}/models",
+            "headers": {"Authorization": f"Bearer {api_key}"} if api_key else {}}
+
+
+async def ping() -> bool:
+    """
+    Sends a cheap GET /models on both shared clients so their pooled connections stay open.
+
+    Returns:
+      bool: True if both requests got a response.
+    """
+    try:
+        await get_async_http_client().get(**_ping_request())
+        await asyncio.to_thread(get_http_client().get, **_ping_request())
+        return True
+    except httpx.HTTPError:
+        _count("ping_errors")
+        return False
+
+
+async def warm_up():
+    """Opens the model connections (DNS, TCP, TLS, HTTP/2 settings) before the first user request."""
+    if await ping():
+        _count("warmups")
+
+
+async def _keep_alive(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        if await ping():
+            _count("pings")
+
+
+def install_model_transport(app):
+    """
+    Registers startup and shutdown handlers on a FastAPI app that warm up the shared model
+    connections, keep them alive with a periodic ping and close them on shutdown.
+    """
+    tasks = []
+
+    @app.on_event("startup")
+    async def start_model_transport():
+        await warm_up()
+        if MODEL_KEEPALIVE_INTERVAL > 0:
+            tasks.append(asyncio.create_task(_keep_alive(MODEL_KEEPALIVE_INTERVAL)))
+
+    @app.on_event("shutdown")
+    async def stop_model_transport():
+        for task in tasks:
+            task.cancel()
+        with _lock:
+            clients = dict(_clients)
+            _clients.clear()
+        if "async" in clients:
+            await clients["async"].aclose()
+        if "sync" in clients:
+            clients["sync"].close()
+
+
+def get_transport_stats() -> dict:
+    """
+    Returns request and connection counters for the shared model clients.
+
+    Returns:
+      dict: Counters plus `reuse_rate`, the share of requests served on an already open connection.
+    """
+    with _lock:
+        stats = dict(_stats)
+    stats["http2"] = HTTP2_ENABLED
+    requests = stats["requests"]
+    stats["reuse_rate"] = round(max(0, requests - stats["connections_opened"]) / requests, 3) if requests else None
+    return stats
@@ -0,0 +1,133 @@
+import re  # Identifier extraction from user messages
+import threading  # Guard the staging area shared by request and tool threads
+import time  # Entry expiry
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+PREFETCH_TTL_SECONDS = 30  # Staged results are only trusted briefly; instance state changes
+PREFETCH_WAIT_SECONDS = 10  # How long a tool waits for an in-flight prefetch before calling AWS itself
+
+INSTANCE_ID_PATTERN = re.compile(r"\bi-[0-9a-f]{8,17}\b")
+IPV4_PATTERN = re.compile(r"\b(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)\b")
+QUOTED_PATTERN = re.compile(r"[`'\"]([^`'\"]{2,64})[`'\"]")
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*[A-Za-z0-9]")
+# Tokens that look like resource names: contain - or _ or a digit, or are CamelCase ("WebServer")
+NAME_LIKE_PATTERN = re.compile(r"^(?=.*[A-Za-z])(?:.*[-_\d].*|[A-Z][a-z0-9]+[A-Z].*)$")
+
+MISS = object()  # Returned by SpeculativeCache.take when nothing usable is staged
+
+
+def extract_identifiers(text: str, ignore: re.Pattern = None) -> dict:
+    """
+    Finds likely EC2 instance identifiers in a user message without any API calls.
+
+    Parameters:
+      text (str): The user's message.
+      ignore: Optional pattern; name-like tokens it fully matches (sizes, volume types, ...) are skipped.
+
+    Returns:
+      dict: "instance_ids", "ips" and "names" (quoted strings and name-like tokens), each a list.
+    """
+    instance_ids = INSTANCE_ID_PATTERN.findall(text)
+    ips = IPV4_PATTERN.findall(text)
+    names = [quoted.strip() for quoted in QUOTED_PATTERN.findall(text)]
+    for token in TOKEN_PATTERN.findall(text):
+        if token in instance_ids or token in ips or "." in token:
+            continue  # Already captured, or an instance type / domain rather than a name
+        if ignore is not None and ignore.fullmatch(token):
+            continue
+        if NAME_LIKE_PATTERN.match(token):
+            names.append(token)
+    return {
+        "instance_ids": list(dict.fromkeys(instance_ids)),
+        "ips": list(dict.fromkeys(ips)),
+        "names": list(dict.fromkeys(names)),
+    }
+
+
+class SpeculativeCache:
+    """
+    Short-lived staging area for speculative lookups started before the model asks for them.
+
+    Entries hold futures, so a tool that runs while the prefetch is still in flight waits for
+    it instead of repeating the call. Entries never read before they expire or are invalidated
+    count as waste.
+    """
+
+    def __init__(self, ttl: float = PREFETCH_TTL_SECONDS, max_workers: int = 4):
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._entries = {}  # key -> [future, staged_at, used]
+        self._lock = threading.Lock()
+        self._stats = {"prefetches": 0, "staged": 0, "hits": 0, "wasted": 0, "errors": 0}
+
+    def _expire(self, now: float):
+        for key, (_, staged_at, used) in list(self._entries.items()):
+            if now - staged_at > self.ttl:
+                del self._entries[key]
+                if not used:
+                    self._stats["wasted"] += 1
+
+    def submit(self, fn, *args) -> Future:
+        """Runs a prefetch job in the background and returns its future."""
+        with self._lock:
+            self._stats["prefetches"] += 1
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda f: f.exception() and self._count_error())
+        return future
+
+    def _count_error(self):
+        with self._lock:
+            self._stats["errors"] += 1
+
+    def stage(self, key, value_or_future):
+        """Stages a value (or a future that will produce it) under `key`."""
+        future = value_or_future
+        if not isinstance(future, Future):
+            future = Future()
+            future.set_result(value_or_future)
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            previous = self._entries.get(key)
+            if previous is not None and not previous[2]:
+                self._stats["wasted"] += 1
+            self._entries[key] = [future, now, False]
+            self._stats["staged"] += 1
+
+    def take(self, key, timeout: float = PREFETCH_WAIT_SECONDS):
+        """
+        Returns the staged value for `key`, waiting for an in-flight prefetch if needed,
+        or MISS if there is none (or it failed or expired).
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+        try:
+            value = entry[0].result(timeout=timeout)
+        except (FutureTimeout, Exception):
+            return MISS
+        with self._lock:
+            if not entry[2]:
+                entry[2] = True
+                self._stats["hits"] += 1
+        return value
+
+    def invalidate(self, match=None):
+        """Drops entries whose key satisfies `match` (all entries if None)."""
+        with self._lock:
+            for key in [key for key in self._entries if match is None or match(key)]:
+                _, _, used = self._entries.pop(key)
+                if not used:
+                    self._stats["wasted"] += 1
+
+    def stats(self) -> dict:
+        """Returns prefetch counters plus hit and waste rates over staged entries."""
+        with self._lock:
+            self._expire(time.monotonic())
+            stats = dict(self._stats)
+        settled = stats["hits"] + stats["wasted"]
+        stats["hit_rate"] = round(stats["hits"] / settled, 3) if settled else None
+        stats["waste_rate"] = round(stats["wasted"] / settled, 3) if settled else None
+        return stats
@@ -0,0 +1,148 @@
+"""
+Replays recorded production traffic against a running agent and compares builds.
+
+Start the target with TRAFFIC_REPLAY_ARCHIVE pointing at the same archive so model and AWS
+calls are served from the recorded responses, then run for example:
+
+    python -m utils.replay run data/traffic.jsonl --target http://localhost:8000 --speed 4 --out new.json
+    python -m utils.replay compare old.json new.json --threshold 0.10
+"""
+import argparse  # Command-line interface
+import asyncio  # Drive many requests concurrently on their recorded schedule
+import json  # Result files
+import math  # Nearest-rank percentiles
+import sys  # Exit status for CI use
+import time  # Latency measurement
+import httpx  # Async HTTP client
+from utils.traffic import REPLAY_HEADER, load_records
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(results: list) -> dict:
+    """
+    Builds per-path latency distributions and error counts from individual request results.
+    """
+    report = {}
+    for path in sorted({result["path"] for result in results}):
+        rows = [result for result in results if result["path"] == path]
+        latencies = sorted(result["latency"] for result in rows)
+        report[path] = {
+            "count": len(rows),
+            "errors": sum(1 for result in rows if result["status"] is None or result["status"] >= 400),
+            "mean": sum(latencies) / len(latencies),
+            "max": latencies[-1],
+            **{f"p{pct}": percentile(latencies, pct) for pct in PERCENTILES},
+        }
+    return report
+
+
+async def replay(records: list, target: str, speed: float, timeout: float, concurrency: int) -> list:
+    """
+    Sends every recorded request to `target`, preserving inter-arrival gaps divided by `speed`.
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results = []
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+        first_arrival = records[0]["started_at"]
+        started = time.perf_counter()
+
+        async def send(record):
+            delay = (record["started_at"] - first_arrival) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent = time.perf_counter()
+            try:
+                response = await client.post(record["path"], json=record["request"],
+                                             headers={REPLAY_HEADER: record["id"]})
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            results.append({"id": record["id"], "path": record["path"], "status": status,
+                            "latency": time.perf_counter() - sent, "recorded_latency": record.get("latency")})
+
+        await asyncio.gather(*(send(record) for record in records))
+    return results
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list:
+    """
+    Lists latency percentiles and error rates that got worse by more than `threshold` (a fraction).
+    """
+    regressions = []
+    for path, base in baseline["summary"].items():
+        new = candidate["summary"].get(path)
+        if new is None:
+            continue
+        for metric in [f"p{pct}" for pct in PERCENTILES] + ["mean"]:
+            if base[metric] > 0 and new[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{path} {metric}: {base[metric]:.3f}s -> {new[metric]:.3f}s "
+                                   f"(+{(new[metric] / base[metric] - 1) * 100:.0f}%)")
+        base_rate, new_rate = base["errors"] / base["count"], new["errors"] / new["count"]
+        if new_rate > base_rate:
+            regressions.append(f"{path} error rate: {base_rate:.1%} -> {new_rate:.1%}")
+    return regressions
+
+
+def print_summary(summary: dict):
+    for path, stats in summary.items():
+        print(f"{path}: n={stats['count']} errors={stats['errors']} mean={stats['mean']:.3f}s "
+              + " ".join(f"p{pct}={stats[f'p{pct}']:.3f}s" for pct in PERCENTILES)
+              + f" max={stats['max']:.3f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Replay an archive against a target and report latencies")
+    run_parser.add_argument("source", help='JSONL archive path, or "db" to read db.ChatLog')
+    run_parser.add_argument("--target", default="http://localhost:8000")
+    run_parser.add_argument("--speed", type=float, default=1.0, help="Replay at N times the recorded speed")
+    run_parser.add_argument("--timeout", type=float, default=300)
+    run_parser.add_argument("--concurrency", type=int, default=100)
+    run_parser.add_argument("--out", help="Write per-request results and summary to this JSON file")
+    compare_parser = commands.add_parser("compare", help="Compare two result files and report regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown, e.g. 0.10 = 10%%")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        records = load_records(args.source)
+        if not records:
+            print("No recorded requests found.")
+            return 1
+        results = asyncio.run(replay(records, args.target, args.speed, args.timeout, args.concurrency))
+        summary = summarize(results)
+        print_summary(summary)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as out:
+                json.dump({"target": args.target, "speed": args.speed, "summary": summary, "results": results},
+                          out, indent=2)
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, "r", encoding="utf-8") as f:
+        candidate = json.load(f)
+    regressions = compare(baseline, candidate, args.threshold)
+    print_summary(candidate["summary"])
+    if regressions:
+        print("Regressions:")
+        for line in regressions:
+            print(f"- {line}")
+        return 1
+    print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
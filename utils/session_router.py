@@ -0,0 +1,337 @@
+import asyncio  # Watch for client disconnects while a forwarded request is pending
+import bisect  # Ring lookups
+import hashlib  # Stable hashing of session IDs and node names
+import hmac  # Constant-time secret comparison
+import json  # Parse request bodies for session IDs
+import os  # Cluster membership from environment variables
+import re  # Validate node URLs in membership updates
+import threading  # Guard the ring and counters
+import httpx  # Forward requests and hand off sessions between nodes
+from fastapi import Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Base URLs of every node (one per uvicorn process), e.g. "http://ops-1:8000,http://ops-2:8000"
+CLUSTER_NODES = [node.strip().rstrip("/") for node in os.getenv("CLUSTER_NODES", "").split(",") if node.strip()]
+CLUSTER_SELF = os.getenv("CLUSTER_SELF", "").rstrip("/")  # This node's own entry in CLUSTER_NODES
+CLUSTER_SECRET = os.getenv("CLUSTER_SECRET", "")  # Required whenever the cluster is configured; sent in CLUSTER_AUTH_HEADER
+CLUSTER_VIRTUAL_NODES = int(os.getenv("CLUSTER_VIRTUAL_NODES", "128"))  # Ring points per node; more = smoother spread
+CLUSTER_FORWARD_TIMEOUT = float(os.getenv("CLUSTER_FORWARD_TIMEOUT", "130"))  # Covers a full agent request
+FORWARDED_HEADER = "X-Session-Forwarded-By"  # Marks forwarded requests so they are never forwarded again
+CLUSTER_AUTH_HEADER = "X-Cluster-Secret"
+NODE_URL_PATTERN = re.compile(r"https?://[A-Za-z0-9.\-\[\]:]+")  # Scheme, host and optional port
+HOP_BY_HOP_HEADERS = {"host", "content-length", "connection", "keep-alive", "transfer-encoding", "upgrade"}
+
+
+def whatsapp_session(body: dict) -> str:
+    """WhatsApp webhook: the sender's phone number."""
+    try:
+        return body["entry"][0]["changes"][0]["value"]["messages"][0]["from"]
+    except (KeyError, IndexError, TypeError):
+        return None  # Status callbacks and verification carry no message
+
+
+def teams_session(body: dict) -> str:
+    """Teams webhook: the conversation ID."""
+    return (body.get("conversation") or {}).get("id")
+
+
+def agent_session(body: dict) -> str:
+    """Agent endpoints: the `session_id` (or `user_id`) sent by the chat integrations."""
+    return body.get("session_id") or body.get("user_id")
+
+
+# Request path -> function extracting the session ID from its JSON body
+SESSION_EXTRACTORS = {
+    "/webhook": whatsapp_session,
+    "/teams_webhook": teams_session,
+    "/ops_agent": agent_session,
+    "/ops_agent/stream": agent_session,
+}
+
+
+def _auth_headers() -> dict:
+    return {CLUSTER_AUTH_HEADER: CLUSTER_SECRET}
+
+
+def _forwarded(scope) -> bool:
+    # Only another node, proving it with the cluster secret, may skip routing
+    headers = dict(scope["headers"])
+    secret = headers.get(CLUSTER_AUTH_HEADER.lower().encode("latin-1"), b"")
+    return (FORWARDED_HEADER.lower().encode("latin-1") in headers
+            and bool(CLUSTER_SECRET) and hmac.compare_digest(secret, CLUSTER_SECRET.encode("utf-8")))
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring mapping session IDs to nodes.
+
+    Each node owns CLUSTER_VIRTUAL_NODES points on the ring, so adding or removing a node only
+    moves the sessions between it and its neighbours (about 1/N of them) to a new owner.
+    """
+
+    def __init__(self, nodes: list = (), virtual_nodes: int = CLUSTER_VIRTUAL_NODES):
+        self.virtual_nodes = virtual_nodes
+        self.set_nodes(nodes)
+
+    def set_nodes(self, nodes: list):
+        self.nodes = sorted(set(nodes))
+        points = sorted((_hash(f"{node}#{index}"), node) for node in self.nodes for index in range(self.virtual_nodes))
+        self._keys = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, session_id: str) -> str:
+        """Returns the node that owns `session_id`, or None for an empty ring."""
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(session_id)) % len(self._keys)
+        return self._owners[index]
+
+
+class SessionRouter:
+    """
+    Keeps every request of a session on the node that owns it, so in-memory per-session state
+    (the create-instance form, defaults, caches) stays on one process without a shared store.
+
+    Per-session dicts registered with `register_store` are handed off to their new owner when
+    membership changes.
+    """
+
+    def __init__(self, nodes: list = CLUSTER_NODES, self_node: str = CLUSTER_SELF):
+        self.self_node = self_node
+        self.ring = HashRing(nodes)
+        self.stores = {}  # name -> dict keyed by session ID
+        self._lock = threading.Lock()
+        self._client = None
+        self._stats = {"local": 0, "forwarded": 0, "forward_errors": 0, "handed_off": 0, "received": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.ring.nodes) > 1 and self.self_node in self.ring.nodes
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._stats[counter] += amount
+
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(CLUSTER_FORWARD_TIMEOUT, connect=3))
+        return self._client
+
+    def register_store(self, name: str, store: dict):
+        """Registers a dict keyed by session ID whose entries move with their session."""
+        self.stores[name] = store
+
+    def owner(self, session_id: str) -> str:
+        with self._lock:
+            return self.ring.owner(session_id)
+
+    async def forward(self, request: Request, body: bytes, owner: str):
+        """Replays the request on `owner` and relays its (possibly streamed) response."""
+        headers = {key: value for key, value in request.headers.items() if key.lower() not in HOP_BY_HOP_HEADERS}
+        headers[FORWARDED_HEADER] = self.self_node
+        headers.update(_auth_headers())  # Lets the owner trust FORWARDED_HEADER
+        upstream = self.client().build_request(request.method, owner + request.url.path, params=request.query_params,
+                                               headers=headers, content=body)
+        response = await self.client().send(upstream, stream=True)
+
+        async def relay():
+            try:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+            finally:
+                await response.aclose()
+        response_headers = {key: value for key, value in response.headers.items()
+                            if key.lower() not in HOP_BY_HOP_HEADERS}
+        return StreamingResponse(relay(), status_code=response.status_code, headers=response_headers)
+
+    async def update_membership(self, nodes: list) -> dict:
+        """
+        Replaces the ring membership and hands every registered session entry this node no
+        longer owns to its new owner.
+
+        Returns:
+          dict: Number of entries handed off per node.
+        """
+        with self._lock:
+            self.ring.set_nodes([node.rstrip("/") for node in nodes])
+        moved = {}  # owner -> {store name -> {session ID -> value}}
+        for name, store in self.stores.items():
+            for session_id in list(store):
+                owner = self.owner(str(session_id))
+                if owner and owner != self.self_node:
+                    moved.setdefault(owner, {}).setdefault(name, {})[session_id] = store[session_id]
+        summary = {}
+        for owner, stores in moved.items():
+            try:
+                response = await self.client().post(f"{owner}/cluster/handoff", json={"stores": stores},
+                                                    headers=_auth_headers())
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                print(f"Session handoff to {owner} failed: {e}")  # Keep the entries; the owner starts cold
+                continue
+            for name, entries in stores.items():
+                for session_id in entries:
+                    self.stores[name].pop(session_id, None)
+            summary[owner] = sum(len(entries) for entries in stores.values())
+            self._count("handed_off", summary[owner])
+        return summary
+
+    def receive_handoff(self, stores: dict) -> int:
+        """Adopts handed-off entries; entries already updated here since the change win."""
+        received = 0
+        for name, entries in stores.items():
+            store = self.stores.get(name)
+            if store is None:
+                continue
+            for session_id, value in entries.items():
+                if session_id not in store:
+                    store[session_id] = value
+                    received += 1
+        self._count("received", received)
+        return received
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["nodes"] = list(self.ring.nodes)
+        stats["self"] = self.self_node
+        stats["enabled"] = self.enabled
+        return stats
+
+
+session_router = SessionRouter()  # Process-wide router; configured from CLUSTER_NODES / CLUSTER_SELF
+
+
+class SessionRoutingMiddleware:
+    """
+    ASGI middleware forwarding requests to the node that owns their session.
+
+    Requests to the paths in `extractors` are forwarded unless this node owns the session or
+    they were already forwarded; if the owner is unreachable the request is served locally.
+    Local requests keep the client's receive channel, so endpoints still see disconnects.
+    """
+
+    def __init__(self, app, router: SessionRouter = None, extractors: dict = None):
+        self.app = app
+        self.router = router or session_router
+        self.extractors = extractors or SESSION_EXTRACTORS
+
+    async def __call__(self, scope, receive, send):
+        extract = self.extractors.get(scope.get("path")) if scope["type"] == "http" else None
+        if extract is None or scope["method"] != "POST" or not self.router.enabled or _forwarded(scope):
+            return await self.app(scope, receive, send)
+        chunks, more_body = [], True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                return  # Client left before sending the whole body
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+        body_replayed = False
+
+        async def replay_body():
+            # Hand the buffered body on once, then pass through (e.g. http.disconnect)
+            nonlocal body_replayed
+            if not body_replayed:
+                body_replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        try:
+            session_id = extract(json.loads(body or b"{}"))
+        except (ValueError, AttributeError):
+            session_id = None
+        owner = self.router.owner(str(session_id)) if session_id else None
+        if owner is None or owner == self.router.self_node:
+            self.router._count("local")
+            return await self.app(scope, replay_body, send)
+        # Non-streaming endpoints send no headers until they finish, so watch for the client
+        # leaving while waiting and drop the upstream connection (the owner then cancels its run)
+        forwarding = asyncio.create_task(self.router.forward(Request(scope), body, owner))
+        disconnect = asyncio.create_task(receive())
+        await asyncio.wait({forwarding, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        if not forwarding.done():
+            forwarding.cancel()
+            await asyncio.gather(forwarding, return_exceptions=True)
+            self.router._count("forwarded")
+            return
+        disconnect.cancel()
+        try:
+            response = forwarding.result()
+        except httpx.HTTPError as e:
+            self.router._count("forward_errors")
+            print(f"Forwarding session to {owner} failed, serving locally: {e}")
+            return await self.app(scope, replay_body, send)
+        self.router._count("forwarded")
+        await response(scope, replay_body, send)
+
+
+def install_session_router(app, router: SessionRouter = session_router, extractors: dict = None):
+    """
+    Adds session-affinity routing to a FastAPI app when the cluster is configured
+    (CLUSTER_NODES and CLUSTER_SELF); otherwise the app is left unchanged.
+
+    Adds SessionRoutingMiddleware and:
+      GET /cluster               membership and routing counters
+      POST /cluster/membership   {"nodes": [...]} replaces the ring and hands off sessions
+                                 (pass "propagate": true to apply it on every node)
+      POST /cluster/handoff      receives session entries from another node
+    Both POST routes require CLUSTER_SECRET in the CLUSTER_AUTH_HEADER header.
+    Install it after other middleware so it runs first.
+
+    Raises:
+      RuntimeError: If the cluster is configured without a CLUSTER_SECRET.
+    """
+    if not router.self_node or not router.ring.nodes:
+        return
+    if not CLUSTER_SECRET:
+        raise RuntimeError("CLUSTER_SECRET must be set when CLUSTER_NODES / CLUSTER_SELF are configured.")
+    app.add_middleware(SessionRoutingMiddleware, router=router, extractors=extractors)
+
+    def authorized(request: Request) -> bool:
+        return hmac.compare_digest(request.headers.get(CLUSTER_AUTH_HEADER, "").encode("utf-8"),
+                                   CLUSTER_SECRET.encode("utf-8"))
+
+    @app.get("/cluster")
+    async def cluster_status():
+        return router.stats()
+
+    @app.post("/cluster/membership")
+    async def cluster_membership(request: Request):
+        if not authorized(request):
+            return JSONResponse({"error": "forbidden"}, status_code=403)
+        body = await request.json()
+        nodes = body.get("nodes") if isinstance(body, dict) else None
+        if not isinstance(nodes, list) or not nodes or not all(
+                isinstance(node, str) and NODE_URL_PATTERN.fullmatch(node.strip().rstrip("/")) for node in nodes):
+            return JSONResponse({"error": "nodes must be a non-empty list of node URLs such as http://ops-1:8000"},
+                                status_code=400)
+        nodes = [node.strip().rstrip("/") for node in nodes]
+        previous = list(router.ring.nodes)
+        handed_off = await router.update_membership(nodes)
+        if body.get("propagate"):
+            # Every node, old and new, must apply the change so they all agree on ownership
+            for node in sorted(set(previous) | set(nodes)):
+                if node == router.self_node:
+                    continue
+                try:
+                    await router.client().post(f"{node}/cluster/membership", json={"nodes": nodes},
+                                               headers=_auth_headers())
+                except httpx.HTTPError as e:
+                    print(f"Membership update for {node} failed: {e}")
+        return {"nodes": nodes, "handed_off": handed_off}
+
+    @app.post("/cluster/handoff")
+    async def cluster_handoff(request: Request):
+        if not authorized(request):
+            return JSONResponse({"error": "forbidden"}, status_code=403)
+        body = await request.json()
+        stores = body.get("stores") if isinstance(body, dict) else None
+        if not isinstance(stores, dict) or not all(isinstance(entries, dict) for entries in stores.values()):
+            return JSONResponse({"error": "stores must map store names to session entries"}, status_code=400)
+        return {"received": router.receive_handoff(stores)}
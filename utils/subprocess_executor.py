@@ -0,0 +1,174 @@
+import asyncio  # Non-blocking subprocess management
+import os  # Process-group signalling and environment configuration
+import signal  # SIGTERM / SIGKILL on timeout
+import threading  # One concurrency limit shared by every event loop and thread
+import time  # Duration measurement
+from dataclasses import dataclass  # Structured command results
+
+MAX_CONCURRENT_COMMANDS = int(os.getenv("MAX_CONCURRENT_COMMANDS", "4"))  # Commands running at once
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("COMMAND_TIMEOUT_SECONDS", "60"))
+MAX_OUTPUT_BYTES = int(os.getenv("COMMAND_MAX_OUTPUT_BYTES", str(256 * 1024)))  # Kept per stream
+MAX_LINE_BYTES = 1024 * 1024  # Longer lines are delivered in pieces
+KILL_GRACE_SECONDS = 5  # Time between SIGTERM and SIGKILL
+SLOT_POLL_SECONDS = 0.05  # How often a waiting command checks for a free slot
+
+# Process-wide, not per event loop: sync callers run each command on a fresh loop (asyncio.run)
+_slots = threading.BoundedSemaphore(MAX_CONCURRENT_COMMANDS)
+
+
+@dataclass
+class CommandResult:
+    """Outcome of a shell command run through the executor."""
+    command: str
+    exit_code: int
+    stdout: str
+    stderr: str
+    duration: float
+    timed_out: bool = False
+    truncated: bool = False  # Output beyond MAX_OUTPUT_BYTES was dropped
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0 and not self.timed_out
+
+    def to_dict(self) -> dict:
+        return {**self.__dict__, "ok": self.ok}
+
+
+async def _acquire_slot():
+    # Poll instead of blocking a thread on acquire(), so a cancelled waiter never holds a slot
+    while not _slots.acquire(blocking=False):
+        await asyncio.sleep(SLOT_POLL_SECONDS)
+
+
+async def _kill_process_group(process):
+    """Terminates the command and everything it spawned, escalating to SIGKILL."""
+    if process.returncode is not None:
+        return
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(process.wait(), timeout=KILL_GRACE_SECONDS)
+            return
+        except asyncio.TimeoutError:
+            continue
+
+
+async def _pump(name, reader, queue):
+    # Forward output line by line; a None marks the end of the stream
+    while True:
+        try:
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            line = e.partial  # Last line without a trailing newline (empty at EOF)
+        except asyncio.LimitOverrunError as e:
+            # Line longer than the buffer limit: unlike readline(), readuntil() leaves the data
+            # buffered, so the line is delivered in MAX_LINE_BYTES pieces without losing any of it
+            line = await reader.read(e.consumed or MAX_LINE_BYTES)
+        if not line:
+            break
+        await queue.put((name, line))
+    await queue.put((name, None))
+
+
+async def stream_command(command: str, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                         max_output_bytes: int = MAX_OUTPUT_BYTES, cwd: str = None, env: dict = None):
+    """
+    Runs a shell command and yields its output as it is produced.
+
+    At most MAX_CONCURRENT_COMMANDS commands run at once; further calls wait for a slot.
+    The command runs in its own process group, which is killed on timeout or cancellation.
+
+    Yields:
+      {"stream": "stdout" | "stderr", "line": str} for every output line within the byte cap,
+      then {"stream": "exit", "result": CommandResult} once the command has finished.
+    """
+    await _acquire_slot()
+    try:
+        started = time.monotonic()
+        process = await asyncio.create_subprocess_shell(
+            command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=cwd,
+            env=env,
+            start_new_session=True,  # New process group so the whole tree can be killed
+            limit=MAX_LINE_BYTES,
+        )
+        queue = asyncio.Queue()
+        pumps = [
+            asyncio.create_task(_pump("stdout", process.stdout, queue)),
+            asyncio.create_task(_pump("stderr", process.stderr, queue)),
+        ]
+        captured = {"stdout": [], "stderr": []}
+        sizes = {"stdout": 0, "stderr": 0}
+        full = {"stdout": False, "stderr": False}  # Stream reached the byte cap
+        truncated = timed_out = False
+        open_streams = 2
+        try:
+            while open_streams:
+                remaining = timeout - (time.monotonic() - started)
+                try:
+                    name, line = await asyncio.wait_for(queue.get(), timeout=max(remaining, 0))
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    await _kill_process_group(process)
+                    break
+                if line is None:
+                    open_streams -= 1
+                    continue
+                if full[name]:
+                    continue  # Keep draining so the command never blocks on a full pipe
+                if sizes[name] + len(line) > max_output_bytes:
+                    # Keep what fits and capture nothing after it: the result is a prefix, never gappy
+                    truncated = full[name] = True
+                    line = line[:max_output_bytes - sizes[name]]
+                    if not line:
+                        continue
+                sizes[name] += len(line)
+                text = line.decode("utf-8", "replace")
+                captured[name].append(text)
+                yield {"stream": name, "line": text.rstrip("\n")}
+            exit_code = await process.wait()
+        finally:
+            await _kill_process_group(process)  # No-op unless we were cancelled or timed out
+            for pump in pumps:
+                pump.cancel()
+        result = CommandResult(
+            command=command,
+            exit_code=exit_code,
+            stdout="".join(captured["stdout"]),
+            stderr="".join(captured["stderr"]),
+            duration=time.monotonic() - started,
+            timed_out=timed_out,
+            truncated=truncated,
+        )
+    finally:
+        _slots.release()  # Before the last yield: callers may stop iterating once they have the result
+    yield {"stream": "exit", "result": result}
+
+
+async def run_command(command: str, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                      max_output_bytes: int = MAX_OUTPUT_BYTES, on_output=None, cwd: str = None,
+                      env: dict = None) -> CommandResult:
+    """
+    Runs a shell command and returns its structured result.
+
+    Parameters:
+      on_output: Optional callback (or coroutine function) called as on_output(stream, line)
+        for every line as it arrives, e.g. to forward progress to the user.
+
+    Returns:
+      CommandResult: Exit code, captured stdout/stderr, duration and timeout/truncation flags.
+    """
+    async for event in stream_command(command, timeout, max_output_bytes, cwd, env):
+        if event["stream"] == "exit":
+            return event["result"]
+        if on_output is not None:
+            outcome = on_output(event["stream"], event["line"])
+            if asyncio.iscoroutine(outcome):
+                await outcome
@@ -0,0 +1,138 @@
+import math  # IDF weighting
+import re  # Tokenization
+import threading  # Guard the binding cache and counters
+
+MAX_BOUND_TOOLS = 6  # Upper bound on tool schemas sent with a model call
+
+# Everyday words mapped onto the vocabulary used in tool names and docstrings
+SYNONYMS = {
+    "server": "instance", "servers": "instance", "vm": "instance", "vms": "instance", "machine": "instance",
+    "machines": "instance", "box": "instance", "host": "instance", "node": "instance", "ec2": "instance",
+    # No "up"/"down"/"off": they appear in status questions ("is web-1 up?") as often as in commands
+    "boot": "start", "resume": "start", "shutdown": "stop", "halt": "stop",
+    "launch": "create", "provision": "create", "spin": "create", "new": "create",
+    "detail": "describe", "details": "describe", "info": "describe", "show": "list", "status": "describe",
+    "os": "image", "ami": "image", "ubuntu": "image", "linux": "image", "windows": "image", "debian": "image",
+    "storage": "volume", "disk": "volume", "ebs": "volume",
+    "firewall": "security", "sg": "security", "port": "security",
+    "ssh": "key", "keypair": "key", "pem": "key",
+    "cpu": "vcpus", "cpus": "vcpus", "ram": "memory", "gb": "memory", "size": "type", "sizes": "type",
+}
+# Multi-word commands normalized before tokenizing; their words alone are too ambiguous to map
+PHRASES = {
+    "turn on": "start", "power on": "start", "boot up": "start", "start up": "start",
+    "turn off": "stop", "power off": "stop", "shut down": "stop", "power down": "stop",
+}
+PHRASE_PATTERN = re.compile(r"\b(" + "|".join(re.escape(phrase) for phrase in PHRASES) + r")\b")
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "for", "in", "on", "with", "is", "are", "be", "it", "my", "me",
+    "i", "you", "your", "this", "that", "what", "which", "please", "can", "could", "would", "returns",
+    "string", "formatted", "str", "int", "float", "if", "as", "by", "from", "e", "g", "eg", "all",
+}
+
+
+def tokenize(text: str) -> list:
+    """Lower-cases, splits, normalizes synonyms and light plurals, and drops stopwords."""
+    tokens = []
+    text = PHRASE_PATTERN.sub(lambda match: PHRASES[match.group(1)], text.lower())
+    for word in re.findall(r"[a-z0-9]+", text.replace("_", " ")):
+        word = SYNONYMS.get(word, word)
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = SYNONYMS.get(word[:-1], word[:-1])
+        if word not in STOPWORDS:
+            tokens.append(word)
+    return tokens
+
+
+class ToolSelector:
+    """
+    Picks the tools relevant to a turn by keyword retrieval over tool names and descriptions,
+    and caches one model binding per distinct tool subset so schemas are serialized once.
+    """
+
+    def __init__(self, tools: list, max_tools: int = MAX_BOUND_TOOLS, always_include=(), companions: dict = None,
+                 commands: dict = None):
+        """
+        Parameters:
+          tools (list): Every tool the agent can use.
+          max_tools (int): Number of retrieved tools to bind per turn.
+          always_include: Tool names bound on every turn.
+          companions (dict): Tool name -> names bound alongside it whenever it is selected.
+          commands (dict): Tool name -> command tokens (after `tokenize`), one of which the message
+            must contain for the tool to be bound, e.g. {"stop_instance": {"stop"}}. Keeps
+            state-changing tools away from questions that merely resemble their descriptions.
+        """
+        self.tools = {tool.name: tool for tool in tools}
+        self.max_tools = max_tools
+        self.always_include = list(always_include)
+        self.companions = companions or {}
+        self.commands = {name: set(tokens) for name, tokens in (commands or {}).items()}
+        self._bindings = {}  # (model id, tool names) -> bound runnable
+        self._lock = threading.Lock()
+        self._stats = {"selections": 0, "fallbacks": 0, "tools_bound": 0}
+        # Name tokens count triple; rare tokens (high IDF) count more than ones every tool shares
+        document_tokens = {
+            name: tokenize(name) * 3 + tokenize(tool.description or "") for name, tool in self.tools.items()
+        }
+        document_frequency = {}
+        for tokens in document_tokens.values():
+            for token in set(tokens):
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+        total = len(self.tools)
+        self._weights = {
+            name: {token: tokens.count(token) * math.log(1 + total / document_frequency[token])
+                   for token in set(tokens)}
+            for name, tokens in document_tokens.items()
+        }
+
+    def select(self, text: str, include=()) -> list:
+        """
+        Returns the tools to bind for a turn.
+
+        Parameters:
+          text (str): The user's message.
+          include: Tool names that must be bound (e.g. tools already called in this request).
+
+        Returns:
+          list: Selected tools, or every tool when nothing in `text` matches.
+        """
+        query = set(tokenize(text))
+        # Tools whose command the message does not give are never bound (unless already in use)
+        allowed = {name for name in self.tools if name not in self.commands or self.commands[name] & query}
+        scores = {name: sum(weights.get(token, 0) for token in query)
+                  for name, weights in self._weights.items() if name in allowed}
+        ranked = [name for name, score in sorted(scores.items(), key=lambda item: -item[1]) if score > 0]
+        with self._lock:
+            self._stats["selections"] += 1
+            if not ranked:
+                self._stats["fallbacks"] += 1
+        if not ranked:
+            # Unclear intent: let the model see everything it may use
+            return [tool for name, tool in self.tools.items() if name in allowed or name in include]
+        names = list(dict.fromkeys(self.always_include + [name for name in include if name in self.tools]
+                                   + ranked[:self.max_tools]))
+        names = list(dict.fromkeys(names + [companion for name in names for companion in self.companions.get(name, ())
+                                            if companion in self.tools]))
+        with self._lock:
+            self._stats["tools_bound"] += len(names)
+        return [self.tools[name] for name in names]
+
+    def bind(self, model, tools: list):
+        """Returns `model.bind_tools(tools)`, reusing the binding made for the same subset earlier."""
+        key = (id(model), tuple(sorted(tool.name for tool in tools)))
+        binding = self._bindings.get(key)
+        if binding is None:
+            with self._lock:
+                binding = self._bindings.get(key)
+                if binding is None:
+                    binding = self._bindings[key] = model.bind_tools(tools)
+        return binding
+
+    def stats(self) -> dict:
+        """Returns selection counters, average subset size and number of cached bindings."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_bindings"] = len(self._bindings)
+        matched = stats["selections"] - stats["fallbacks"]
+        stats["avg_tools_bound"] = round(stats.pop("tools_bound") / matched, 2) if matched else None
+        return stats
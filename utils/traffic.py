@@ -0,0 +1,305 @@
+import asyncio  # Replay stubs emulate recorded backend latency without blocking the loop
+import contextvars  # Carry the current recording / replay entry through the request
+import hashlib  # Deterministic pseudonyms for user identifiers
+import json  # JSONL archive format
+import os  # Environment configuration and file paths
+import re  # Redaction patterns
+import threading  # Serialize archive writes
+import time  # Timestamps and latency measurement
+import uuid  # Record identifiers
+from fastapi import Request
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import StructuredTool
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRAFFIC_RECORD = os.getenv("TRAFFIC_RECORD", "").lower() in ("1", "true", "yes")
+TRAFFIC_SINK = os.getenv("TRAFFIC_SINK", "jsonl")  # "jsonl" or "db" (db.ChatLog)
+TRAFFIC_ARCHIVE_PATH = os.getenv("TRAFFIC_ARCHIVE_PATH", os.path.join(BASE_DIR, "..", "data", "traffic.jsonl"))
+TRAFFIC_ANON_SALT = os.getenv("TRAFFIC_ANON_SALT", "")
+TRAFFIC_REPLAY_ARCHIVE = os.getenv("TRAFFIC_REPLAY_ARCHIVE")  # Serve recorded model/tool responses from this archive
+RECORDED_PATHS = ("/ops_agent", "/ops_agent/stream")  # The chat integrations call the agent through these
+REPLAY_HEADER = "X-Replay-Id"
+
+# Personal data removed from recorded text
+PHONE_PATTERN = re.compile(r"\+?\b\d[\d -]{8,14}\d\b")
+EMAIL_PATTERN = re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.-]+\b")
+SECRET_PATTERN = re.compile(r"\b(?:AKIA|ASIA)[0-9A-Z]{16}\b|\bsk-[A-Za-z0-9_-]{20,}\b")
+# Request body keys whose values identify a user and are replaced with pseudonyms
+IDENTITY_KEYS = {"from", "to", "wa_id", "session_id", "user_id", "phone_number", "display_phone_number", "name"}
+# Keys pseudonymized inside recorded messages and tool inputs, where "name" is a tool name and must survive
+MESSAGE_IDENTITY_KEYS = {"session_id", "user_id"}
+
+current_record = contextvars.ContextVar("current_record", default=None)
+current_replay_id = contextvars.ContextVar("current_replay_id", default=None)
+current_replay_state = contextvars.ContextVar("current_replay_state", default=None)  # Per-request replay cursor
+_write_lock = threading.Lock()
+
+
+def pseudonym(value: str) -> str:
+    """Returns a stable, salted pseudonym so the same user maps to the same token across records."""
+    digest = hashlib.sha256(f"{TRAFFIC_ANON_SALT}:{value}".encode()).hexdigest()[:12]
+    return f"anon-{digest}"
+
+
+def anonymize(value, identity_keys=IDENTITY_KEYS):
+    """
+    Recursively redacts phone numbers, e-mail addresses and credentials in strings and
+    replaces the values of `identity_keys` with pseudonyms.
+
+    Use the default keys for request bodies only; pass MESSAGE_IDENTITY_KEYS for recorded
+    messages and tool calls, whose `name` fields are tool names that replay must match.
+    """
+    if isinstance(value, str):
+        value = SECRET_PATTERN.sub("[secret]", value)
+        value = EMAIL_PATTERN.sub(lambda m: pseudonym(m.group(0)), value)
+        return PHONE_PATTERN.sub(lambda m: pseudonym(re.sub(r"\D", "", m.group(0))), value)
+    if isinstance(value, dict):
+        return {key: pseudonym(str(item)) if key in identity_keys and isinstance(item, (str, int))
+                else anonymize(item, identity_keys) for key, item in value.items()}
+    if isinstance(value, list):
+        return [anonymize(item, identity_keys) for item in value]
+    return value
+
+
+def write_record(record: dict):
+    """Appends a finished record to the configured sink (JSONL archive or db.ChatLog)."""
+    if TRAFFIC_SINK == "db":
+        from db.db import SessionLocal, ChatLog  # Imported lazily; needs Postgres configured
+        db = SessionLocal()
+        try:
+            db.add(ChatLog(
+                id=record["id"],
+                user_input=json.dumps({"path": record["path"], "body": record["request"]}),
+                bot_response=json.dumps({key: value for key, value in record.items() if key != "request"}),
+            ))
+            db.commit()
+        finally:
+            db.close()
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(TRAFFIC_ARCHIVE_PATH)), exist_ok=True)
+    line = json.dumps(record, default=str)
+    with _write_lock, open(TRAFFIC_ARCHIVE_PATH, "a", encoding="utf-8") as archive:
+        archive.write(line + "\n")
+
+
+def load_records(source: str) -> list:
+    """
+    Loads recorded requests from a JSONL archive path, or from db.ChatLog when `source` is "db".
+
+    Returns:
+      list: Records sorted by their original arrival time.
+    """
+    records = []
+    if source == "db":
+        from db.db import SessionLocal, ChatLog
+        db = SessionLocal()
+        try:
+            for row in db.query(ChatLog).all():
+                try:
+                    request = json.loads(row.user_input)
+                    details = json.loads(row.bot_response)
+                except ValueError:
+                    continue  # Ordinary chat log rows are not traffic records
+                if isinstance(request, dict) and "path" in request:
+                    records.append({**details, "id": row.id, "path": request["path"], "request": request["body"]})
+        finally:
+            db.close()
+    else:
+        with open(source, "r", encoding="utf-8") as archive:
+            records = [json.loads(line) for line in archive if line.strip()]
+    return sorted(records, key=lambda record: record["started_at"])
+
+
+class TrafficRecorder:
+    """
+    ASGI middleware that records anonymized requests to `paths`, their responses and latency.
+
+    Response bodies are copied into the record as they are sent, so streamed responses reach
+    the client unchanged, and the endpoint still receives the client's disconnect.
+    """
+
+    def __init__(self, app, paths=RECORDED_PATHS):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        chunks, more_body = [], True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                return  # Client left before sending the whole body
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        raw_body = b"".join(chunks)
+        body_replayed = False
+
+        async def replay_body():
+            # Hand the buffered body to the app once, then pass through (e.g. http.disconnect)
+            nonlocal body_replayed
+            if not body_replayed:
+                body_replayed = True
+                return {"type": "http.request", "body": raw_body, "more_body": False}
+            return await receive()
+
+        try:
+            body = json.loads(raw_body or b"{}")
+        except ValueError:
+            body = raw_body.decode("utf-8", "replace")
+        record = {
+            "id": str(uuid.uuid4()),
+            "path": scope["path"],
+            "started_at": time.time(),
+            "request": anonymize(body),
+            "model_calls": [],
+            "tool_calls": [],
+        }
+        response_chunks = []
+        content_type = ""
+
+        async def capture(message):
+            nonlocal content_type
+            if message["type"] == "http.response.start":
+                record["status"] = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"").decode("latin-1")
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        token = current_record.set(record)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, replay_body, capture)
+        finally:
+            current_record.reset(token)
+        record["latency"] = time.perf_counter() - started
+        content = b"".join(response_chunks)
+        try:
+            if content_type.startswith("application/x-ndjson"):
+                # Streamed answers are kept as their list of events
+                events = [json.loads(line) for line in content.splitlines() if line.strip()]
+                record["response"] = anonymize(events)
+            else:
+                record["response"] = anonymize(json.loads(content or b"null"))
+        except ValueError:
+            record["response"] = anonymize(content.decode("utf-8", "replace"))
+        try:
+            await asyncio.to_thread(write_record, record)
+        except Exception as e:
+            print(f"Traffic recording failed: {e}")  # Never fail the request because of recording
+
+
+def install_traffic_recorder(app, paths=RECORDED_PATHS):
+    """
+    Adds the TrafficRecorder middleware for `paths` to an app. Model and tool outputs are
+    attached by `utils.callbacks.RecordingCallbackHandler`.
+    Does nothing unless TRAFFIC_RECORD is enabled.
+    """
+    if not TRAFFIC_RECORD:
+        return
+    app.add_middleware(TrafficRecorder, paths=paths)
+
+
+class ReplayStore:
+    """
+    Recorded model and tool responses indexed by record ID, used to stub backends during replay.
+    """
+
+    def __init__(self, source: str):
+        self.records = {record["id"]: record for record in load_records(source)}
+
+    def current(self) -> dict:
+        record_id = current_replay_id.get()
+        if record_id not in self.records:
+            raise LookupError(f"No recorded responses for replay id {record_id!r}")
+        return self.records[record_id]
+
+
+def install_traffic_replay(app, store: ReplayStore):
+    """
+    Adds middleware that selects the recorded entry named by the X-Replay-Id request header.
+    """
+    @app.middleware("http")
+    async def select_replay_record(request: Request, call_next):
+        token = current_replay_id.set(request.headers.get(REPLAY_HEADER))
+        state_token = current_replay_state.set({"used_tool_calls": set()})
+        try:
+            return await call_next(request)
+        finally:
+            current_replay_state.reset(state_token)
+            current_replay_id.reset(token)
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Chat model stub that returns the recorded model responses of the current replayed request,
+    after waiting for the recorded model latency.
+    """
+
+    store: ReplayStore
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def bind_tools(self, tools, **kwargs):
+        return self  # Tool calls are part of the recorded responses
+
+    def _recorded_call(self, messages) -> dict:
+        calls = self.store.current()["model_calls"]
+        index = sum(isinstance(message, AIMessage) for message in messages)  # Nth model call of this request
+        if index >= len(calls):
+            return {"message": {"type": "ai", "data": {"content": "[replay: no further recorded model calls]"}},
+                    "latency": 0}
+        return calls[index]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        call = self._recorded_call(messages)
+        time.sleep(call.get("latency", 0))
+        return ChatResult(generations=[ChatGeneration(message=messages_from_dict([call["message"]])[0])])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        call = self._recorded_call(messages)
+        await asyncio.sleep(call.get("latency", 0))
+        return ChatResult(generations=[ChatGeneration(message=messages_from_dict([call["message"]])[0])])
+
+
+def replay_tool(original, store: ReplayStore):
+    """
+    Wraps a tool so it returns the recorded output for the current replayed request instead of
+    calling AWS. Calls are matched by tool name and input, falling back to call order.
+    """
+    def recorded_output(**kwargs):
+        record = store.current()
+        used = current_replay_state.get()["used_tool_calls"]
+        candidates = [(i, call) for i, call in enumerate(record["tool_calls"])
+                      if call["tool"] == original.name and i not in used]
+        match = next(((i, call) for i, call in candidates if call.get("input") == kwargs), None)
+        match = match or (candidates[0] if candidates else None)
+        if match is None:
+            return f"[replay: no recorded output for {original.name}]"
+        used.add(match[0])
+        return match[1]
+
+    def func(**kwargs):
+        call = recorded_output(**kwargs)
+        if isinstance(call, str):
+            return call
+        time.sleep(call.get("latency", 0))
+        return call["output"]
+
+    async def coroutine(**kwargs):
+        call = recorded_output(**kwargs)
+        if isinstance(call, str):
+            return call
+        await asyncio.sleep(call.get("latency", 0))
+        return call["output"]
+
+    return StructuredTool(name=original.name, description=original.description,
+                          args_schema=original.args_schema, func=func, coroutine=coroutine)
@@ -1,10 +1,15 @@
-import subprocess  # Used for interacting with system shell commands
+import asyncio  # Drive the async executor from synchronous callers
 from langchain_core.messages import ToolMessage  # Message type for messages generated by tools
+from utils.subprocess_executor import run_command  # Bounded, streaming async subprocess executor
 
 def execute_command(command: str, capture_output: bool = False) -> str:
     """
     Executes a shell command and returns its output.
     
+    Synchronous wrapper around `utils.subprocess_executor.run_command` for callers without an
+    event loop (e.g. sync tools running in a worker thread). Async code should await
+    `run_command` directly to get streamed output and the full structured result.
+    
     Parameters:
       command (str): The shell command to be executed.
       capture_output (bool): If True, captures and returns the output; otherwise, discards it.
@@ -12,16 +17,8 @@ def execute_command(command: str, capture_output: bool = False) -> str:
     Returns:
       str: The resulting standard output, stripped of extra whitespace.
     """
-    # Run the command with a timeout and proper stdout/stderr redirection
-    result = subprocess.run(
-        command,
-        shell=True,
-        stdout=subprocess.PIPE if capture_output else subprocess.DEVNULL,
-        text=True,
-        timeout=60,  # Limit command execution time
-        stderr=subprocess.PIPE
-    )
-    return result.stdout.strip()  # Return the clean output
+    result = asyncio.run(run_command(command))  # Process-wide command limit, timeout and output cap
+    return result.stdout.strip() if capture_output else ""
 
 def handle_tool_calls(history):
     """